@@ -1,15 +1,68 @@
 
+import atexit
+import functools
+import heapq
+import io
+import json
 import multiprocessing
 import os
+import re
 import shutil
 import subprocess
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Written into the build tree after a successful cmake configure; holds the
+# configure command so a changed command forces a clean reconfigure.
+CONFIGURE_STAMP = ".gpt_validator_configure"
+
+# ctest's failure summary: a header line followed by "<index> - <name> (<status>)"
+# rows, terminated by a blank line.
+_FAILED_HEADER = re.compile(r"The following tests FAILED:")
+_FAILED_ROW = re.compile(r"\s*\d+\s*-\s*(\S+)")
+
+# ctest writes JUnit reports (`--output-junit`) from this version on.
+CTEST_JUNIT_VERSION = (3, 21)
+_CTEST_VERSION = re.compile(r"ctest version (\d+)\.(\d+)")
+
+# Directory under .git that clean_build_dirs moves old build trees into.
+OLD_BUILDS_DIR = "gpt_validator-old-builds"
+# Background deletions of build trees moved aside by clean_build_dirs.
+_CLEANUP_THREADS: list[threading.Thread] = []
+
+
+def _join_cleanup_threads(timeout: float = 2.0):
+    # give pending deletions a moment at exit; leftovers are left on disk
+    for thread in _CLEANUP_THREADS:
+        thread.join(timeout)
+
+
+atexit.register(_join_cleanup_threads)
+
 
 def git_repo_root(cwd: Path | str | None = None) -> Path | None:
+    """Return the top level of the git work tree containing cwd (default: the current directory)."""
+    return _git_repo_root(str(cwd) if cwd is not None else os.getcwd())
+
+
+@functools.lru_cache(maxsize=None)
+def _git_repo_root(cwd: str) -> Path | None:
+    # A .git directory (or the .git file of a worktree/submodule) marks the
+    # top level; finding it takes a few stats instead of spawning git.
+    candidate = Path(cwd).resolve()
+    while True:
+        if (candidate / ".git").exists():
+            return candidate
+        if candidate.parent == candidate:
+            break
+        candidate = candidate.parent
     try:
-        # Use subprocess.run so test monkeypatches that replace subprocess.run
-        # (and which may not accept a `timeout` kwarg) are compatible.
+        # Layouts the walk cannot see, e.g. GIT_DIR/GIT_WORK_TREE set in the
+        # environment. Use subprocess.run so test monkeypatches that replace
+        # subprocess.run (and which may not accept a `timeout` kwarg) are compatible.
         proc = subprocess.run(
             ["git", "rev-parse", "--show-toplevel"],
             cwd=cwd,
@@ -21,18 +74,63 @@ def git_repo_root(cwd: Path | str | None = None) -> Path | None:
             return None
         out = proc.stdout.strip()
         return Path(out).resolve()
-    except subprocess.CalledProcessError:
+    except (subprocess.CalledProcessError, OSError):
         return None
 
+
+@functools.lru_cache(maxsize=64)
+def _which(name: str, path: str | None) -> str:
+    """Return the absolute path of program `name` on `path`, or `name` itself.
+
+    Cached per (name, PATH), so the PATH walk happens once per program
+    rather than in every exec.
+    """
+    return shutil.which(name, path=path) or name
+
+
+class CtestFailureScanner:
+    """Collect failed test names from ctest output fed one line at a time."""
+
+    def __init__(self):
+        self.failures: list[str] = []
+        self._capture = False
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, line: str):
+        if self._done:
+            return
+        if not self._capture:
+            if _FAILED_HEADER.match(line):
+                self._capture = True
+            return
+        row = _FAILED_ROW.match(line)
+        if row:
+            self.failures.append(row.group(1))
+        elif not line.strip():
+            self._done = True
+
+
 class TestRunner:
-    def __init__(self, use_host_compiler: bool = True):
+    def __init__(self, use_host_compiler: bool = True, use_ccache: bool = True):
         self.script_dir = Path(__file__).parent
-        self.repo_root = git_repo_root(self.script_dir) or Path.cwd()
+        # resolved once here; every configured path is joined onto it
+        self.repo_root = (git_repo_root(self.script_dir) or Path.cwd()).resolve()
         self.use_gcc_builder = False
         self.builder = { "command": "", "execute_path": Path, "build_path": Path , "gcc_builder": True, "compiler_flags": [] }
         self.runner = { "command": "", "execute_path": Path, "build_path": Path }
         self.env = build_env(use_host_compiler)
+        self.use_ccache = use_ccache
         self.cores = self.get_cores(8)
+        # leave two cores of headroom for the build and the agent itself
+        self.test_jobs = max(1, self.get_cores(None) - 2)
+        self.shard = False
+        self.junit_reports: list[Path] = []
+        self.test_logs: list[Path] = []
+        self._ctest_version: tuple[int, ...] | None = None
         self._failed = False
         self.custom_cmd_output = ""
 
@@ -71,13 +169,153 @@ class TestRunner:
         return self.custom_cmd_output
     
     def clean_build_dirs(self, build_dir: Path):
+        """Replace build_dir with an empty directory.
+
+        The old tree is moved aside and deleted in a background thread, so
+        the build can start right away. Inside the repository it goes to
+        `.git/gpt_validator-old-builds/`, where git never looks for untracked
+        files; elsewhere it is renamed to `<name>.old.<pid>.<n>`. It is
+        deleted in place when it cannot be moved there.
+        """
+        build_dir = Path(build_dir)
         if build_dir.exists():
-            shutil.rmtree(build_dir)
+            old = self.old_build_path(build_dir)
+            moved = False
+            if old is not None:
+                try:
+                    old.parent.mkdir(exist_ok=True)
+                    os.replace(build_dir, old)
+                    moved = True
+                except OSError:
+                    pass
+            if moved:
+                # also sweeps trees left behind by runs that exited mid-delete
+                target = old.parent if old.parent.name == OLD_BUILDS_DIR else old
+                thread = threading.Thread(target=shutil.rmtree, args=(target,), kwargs={"ignore_errors": True}, daemon=True)
+                thread.start()
+                _CLEANUP_THREADS.append(thread)
+            else:
+                shutil.rmtree(build_dir)
         build_dir.mkdir(parents=True, exist_ok=True)
 
+    def old_build_path(self, build_dir: Path) -> Path | None:
+        """Return where clean_build_dirs moves build_dir before deleting it,
+        or None if it has to be deleted in place."""
+        name = f"{build_dir.name}.old.{os.getpid()}.{len(_CLEANUP_THREADS)}"
+        build_dir = build_dir.resolve()
+        if not build_dir.is_relative_to(self.repo_root):
+            return build_dir.with_name(name)
+        git_dir = self.repo_root / ".git"
+        # a .git file (worktree, submodule) points elsewhere, maybe another filesystem
+        if not git_dir.is_dir():
+            return None
+        return git_dir / OLD_BUILDS_DIR / name
 
-    def gcc_builder(self):
+    def compiler_launcher_flags(self) -> list[str]:
+        """Return CMake compiler launcher defines for ccache/sccache and distcc.
+
+        With both a cache and distcc available the launchers are chained as
+        "<cache>;distcc", so cache misses are compiled remotely. Returns an
+        empty list when no launcher applies.
+        """
+        launchers = []
+        if self.use_ccache:
+            cache = shutil.which("ccache") or shutil.which("sccache")
+            if cache:
+                launchers.append(cache)
+        distcc = self.distcc_launcher()
+        if distcc:
+            launchers.append(distcc)
+        if not launchers:
+            return []
+        launcher = ";".join(launchers)
+        return [f"-DCMAKE_C_COMPILER_LAUNCHER={launcher}", f"-DCMAKE_CXX_COMPILER_LAUNCHER={launcher}"]
+
+    def distcc_launcher(self) -> str | None:
+        """Return the distcc path if DISTCC_HOSTS is set and distcc is installed."""
+        env = self.env if self.env is not None else os.environ
+        if not env.get("DISTCC_HOSTS"):
+            return None
+        return shutil.which("distcc")
+
+    def build_jobs(self) -> int:
+        """Return the -j value for the build step.
 
+        Remote distcc slots outnumber local cores, so with distcc active this is
+        DISTCC_JOBS or four times the local core count.
+        """
+        if not self.distcc_launcher():
+            return self.cores
+        env = self.env if self.env is not None else os.environ
+        try:
+            return max(1, int(env.get("DISTCC_JOBS", self.cores * 4)))
+        except ValueError:
+            return self.cores * 4
+
+    def generator_flags(self) -> list[str]:
+        """Return `-G Ninja` when ninja is installed, else keep CMake's default generator."""
+        if shutil.which("ninja"):
+            return ["-G", "Ninja"]
+        return []
+
+    @staticmethod
+    def read_stamp(stamp: Path) -> str | None:
+        try:
+            return stamp.read_text()
+        except OSError:
+            return None
+
+    def needs_configure(self, stamp: Path) -> bool:
+        """Return True if cmake has to (re)configure the build tree.
+
+        The build tree is up to date when it holds a CMakeCache.txt and no
+        CMakeLists.txt or *.cmake file under the source dir is newer than
+        the configure `stamp`.
+        """
+        build_path = Path(self.builder["build_path"])
+        if not (build_path / "CMakeCache.txt").exists():
+            return True
+        try:
+            stamp_mtime = stamp.stat().st_mtime
+        except OSError:
+            return True
+        return self.sources_newer_than(stamp_mtime, lambda name: name == "CMakeLists.txt" or name.endswith(".cmake"))
+
+    def source_dir_filter(self):
+        """Return a `(path, name) -> bool` test telling which directories
+        under execute_path hold sources.
+
+        Dot directories, the configured build_path and build trees moved
+        aside by clean_build_dirs (which may still be being deleted) are not
+        source directories.
+        """
+        build_path = Path(self.builder["build_path"])
+        skip = os.path.abspath(build_path)
+        trash = build_path.name + ".old."
+        return lambda path, name: (not name.startswith(".") and not name.startswith(trash)
+                                   and os.path.abspath(path) != skip)
+
+    def sources_newer_than(self, mtime: float, match=None) -> bool:
+        """Return True if a file under execute_path (optionally filtered by
+        `match` on its name) was modified after `mtime`.
+
+        Dot directories and build trees are not scanned.
+        """
+        is_source_dir = self.source_dir_filter()
+        for root, dirs, files in os.walk(self.builder["execute_path"]):
+            dirs[:] = [d for d in dirs if is_source_dir(os.path.join(root, d), d)]
+            for name in files:
+                if match is not None and not match(name):
+                    continue
+                try:
+                    if os.stat(os.path.join(root, name)).st_mtime > mtime:
+                        return True
+                except OSError:
+                    continue
+        return False
+
+    def configure_command(self) -> list[str]:
+        """Return the cmake configure command for the builder configuration."""
         # Use only the configured compiler flags from self.builder
         cfg_flags = self.builder.get("compiler_flags", [])
         if isinstance(cfg_flags, (list, tuple)):
@@ -89,18 +327,68 @@ class TestRunner:
 
         src = str(self.builder["execute_path"])
         build = str(self.builder["build_path"])
-        cmake_cmd = ["cmake", "-S", src, "-B", build, "-DCMAKE_CXX_COMPILER=g++"] + flags
-        result = self.run(cmake_cmd, cwd=self.builder["execute_path"], capture_output=True)
-        if result and result.returncode != 0:
-            print(f"FAIL: cmake configuration failed with return code {result.returncode}")
-            print(f"Output:\n{result.stderr}")
-            # mark failure for higher-level caller to act on
-            self.custom_cmd_output = result.stderr
-            self._failed = True
+        return (["cmake", "-S", src, "-B", build] + self.generator_flags() + ["-DCMAKE_CXX_COMPILER=g++"]
+                + self.compiler_launcher_flags() + flags)
+
+    def _prefetch_sources(self):
+        """Ask the kernel to read ahead every source file under execute_path.
+
+        Skips dot directories and build trees. Does nothing where
+        posix_fadvise is unavailable.
+        """
+        if not hasattr(os, "posix_fadvise"):
             return
-        result = self.run(["make", f"-j{self.cores}"], cwd=self.builder["build_path"], capture_output=True)
+        is_source_dir = self.source_dir_filter()
+        pending = [str(self.builder["execute_path"])]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if is_source_dir(entry.path, entry.name):
+                            pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        try:
+                            fd = os.open(entry.path, os.O_RDONLY)
+                        except OSError:
+                            continue
+                        try:
+                            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                        except OSError:
+                            pass
+                        finally:
+                            os.close(fd)
+
+    def gcc_builder(self):
+        cmake_cmd = self.configure_command()
+        build = str(self.builder["build_path"])
+        build_path = Path(build)
+        stamp = build_path / CONFIGURE_STAMP
+        configure_args = "\n".join(cmake_cmd)
+        if (build_path / "CMakeCache.txt").exists() and self.read_stamp(stamp) != configure_args:
+            # cached -D options would otherwise survive a changed configure command
+            self.clean_build_dirs(build_path)
+        if self.needs_configure(stamp):
+            # read sources into the page cache while cmake configures
+            threading.Thread(target=self._prefetch_sources, daemon=True).start()
+            result = self.run(cmake_cmd, cwd=self.builder["execute_path"], capture_output=True)
+            if result and result.returncode != 0:
+                print(f"FAIL: cmake configuration failed with return code {result.returncode}")
+                print(f"Output:\n{result.stderr}")
+                # mark failure for higher-level caller to act on
+                self.custom_cmd_output = result.stderr
+                self._failed = True
+                return
+            stamp.write_text(configure_args)
+        else:
+            print("Build tree is configured, skipping cmake configure")
+        # generator agnostic: drives make or ninja, whichever configured the tree
+        result = self.run(["cmake", "--build", build, f"-j{self.build_jobs()}"], cwd=self.builder["build_path"], capture_output=True)
         if result and result.returncode != 0:
-            print(f"FAIL: make failed with return code {result.returncode}")
+            print(f"FAIL: build failed with return code {result.returncode}")
             print(f"Output:\n{result.stderr}")
             self.custom_cmd_output = result.stderr
             self._failed = True
@@ -109,8 +397,11 @@ class TestRunner:
         # Mark the TestRunner as failed so higher-level callers can react.
         self._failed = False
 
-    def make_build(self):
-        self.clean_build_dirs(self.builder["build_path"])
+    def make_build(self, clean: bool = False):
+        if clean:
+            self.clean_build_dirs(self.builder["build_path"])
+        else:
+            Path(self.builder["build_path"]).mkdir(parents=True, exist_ok=True)
         if self.use_gcc_builder:
             # call gcc_builder which uses configured flags from self.builder
             self.gcc_builder()
@@ -129,31 +420,31 @@ class TestRunner:
                 self.custom_cmd_output = result.stdout
 
 
-    def make_testrun(self):
-        self.make_build()
+    def make_testrun(self, clean: bool = False):
+        # always build: an up-to-date tree is a cheap no-op for make/ninja,
+        # and only they track deleted sources and headers outside the tree
+        self.make_build(clean)
         if self.has_failed():
             print("FAIL: Test run failed due to build failure. Skipping test run.")
             return
         if self.use_gcc_builder:
             print("Running ctest to run tests")
-            result = self.run(["ctest", "--output-on-failure"], cwd=self.runner["execute_path"], capture_output=True)
-            """ Case if test are not found """
-            if(result.stderr and result.returncode == 0):
-                print(f"ctest error output:\n{result.stderr}")
-                self._failed = True
-                return
-            """ Case if tests fail """
-            if result.returncode != 0:
-                failures = self.parse_ctest_failures(result.stdout)
-                log_path = (self.runner["build_path"] / "Testing" / "Temporary" / "LastTest.log").resolve()
+            if self.shard:
+                returncode, scraped = self.run_sharded_ctest_tests()
+            else:
+                returncode, scraped = self.run_ctest_tests()
+            """ Case if tests fail (or no tests are found) """
+            if returncode != 0:
+                failures = self.collect_junit_failures()
+                if failures is None:
+                    failures = scraped
+                logs = ", ".join(str(log) for log in self.test_logs)
+                # one write for the whole report, however many tests failed
                 if failures:
-                    print("FAIL: tests failed")
-                    print("Failed tests:")
-                    for name in failures:
-                        print(f"- {name}")
+                    report = "FAIL: tests failed\nFailed tests:\n" + "".join(f"- {name}\n" for name in failures)
                 else:
-                    print("FAIL: tests failed (unable to list failing tests from ctest output)")
-                print(f"Logs: {log_path}")
+                    report = "FAIL: tests failed (unable to list failing tests from ctest output)\n"
+                sys.stdout.write(f"{report}Logs: {logs}\n")
                 # mark failure for higher-level caller to act on
                 self._failed = True
             else:
@@ -173,35 +464,276 @@ class TestRunner:
                 self.custom_cmd_output = result.stdout
 
 
+    def ctest_version(self) -> tuple[int, ...]:
+        """Return ctest's (major, minor) version, or () if it cannot be read.
+
+        `ctest --version` runs once per runner.
+        """
+        if self._ctest_version is None:
+            self._ctest_version = ()
+            try:
+                result = self.run(["ctest", "--version"], capture_output=True)
+            except OSError:
+                return self._ctest_version
+            found = _CTEST_VERSION.search(result.stdout or "") if result.returncode == 0 else None
+            if found:
+                self._ctest_version = (int(found.group(1)), int(found.group(2)))
+        return self._ctest_version
+
+    def junit_flags(self, report: Path) -> list[str]:
+        """Return the ctest flags writing a JUnit report to `report`, or []
+        when ctest is too old to write one.
+
+        A report left over from a previous run is removed either way.
+        """
+        report.unlink(missing_ok=True)
+        if self.ctest_version() < CTEST_JUNIT_VERSION:
+            return []
+        return ["--output-junit", str(report)]
+
+    def run_ctest_tests(self) -> tuple[int, list[str]]:
+        """Run ctest in the runner directory and return (returncode, failures).
+
+        Output is streamed to stdout while ctest runs; failures are the test
+        names picked up from the streamed summary.
+
+        Tests run `test_jobs` at a time. An empty test set is reported as a
+        failure through ctest's `--no-tests=error`. With ctest 3.21 or newer
+        results are also written as JUnit XML to `junit_report_path()`.
+        """
+        if self.env is not None:
+            self.env["CTEST_PARALLEL_LEVEL"] = str(self.test_jobs)
+        # runner paths hang off the resolved repo root, no need to resolve again
+        self.test_logs = [self.runner["build_path"] / "Testing" / "Temporary" / "LastTest.log"]
+        junit = self.junit_report_path()
+        junit_flags = self.junit_flags(junit)
+        self.junit_reports = [junit] if junit_flags else []
+        cmd = ["ctest", "--output-on-failure", "--no-tests=error", f"-j{self.test_jobs}", "--schedule-random",
+               *junit_flags]
+        scanner = CtestFailureScanner()
+        returncode = self.run_streaming(cmd, cwd=self.runner["execute_path"], on_line=scanner.feed)
+        return returncode, scanner.failures
+
+    def list_ctest_tests(self) -> list[str]:
+        """Return test names in ctest's numbering order (test #1 first)."""
+        cmd = ["ctest", "-N", "--show-only=json-v1"]
+        result = self.run(cmd, cwd=self.runner["execute_path"], capture_output=True)
+        if result.returncode != 0:
+            return []
+        try:
+            tests = json.loads(result.stdout).get("tests", [])
+        except ValueError:
+            return []
+        return [t.get("name", "") for t in tests]
+
+    def cost_data_path(self) -> Path:
+        return Path(self.runner["build_path"]) / "Testing" / "Temporary" / "CTestCostData.txt"
+
+    @staticmethod
+    def read_cost_data(cost_file: Path) -> tuple[dict[str, list[str]], list[str]]:
+        """Return the "<name> <runs> <cost>" rows of a CTestCostData.txt keyed
+        by test name, and the names of the tests that failed last.
+        """
+        rows = {}
+        failed = []
+        try:
+            text = cost_file.read_text()
+        except OSError:
+            return rows, failed
+        lines = iter(text.splitlines())
+        for line in lines:
+            # failed test names follow the "---" separator
+            if line.startswith("---"):
+                failed = [name for name in lines if name]
+                break
+            parts = line.rsplit(" ", 2)
+            if len(parts) == 3:
+                rows[parts[0]] = parts
+        return rows, failed
+
+    def read_test_costs(self) -> dict[str, float]:
+        """Return last recorded duration per test from CTestCostData.txt."""
+        costs = {}
+        for name, (_, _, cost) in self.read_cost_data(self.cost_data_path())[0].items():
+            try:
+                costs[name] = float(cost)
+            except ValueError:
+                continue
+        return costs
+
+    def merge_test_costs(self, shard_dirs: list[Path]):
+        """Fold the shards' CTestCostData.txt into the build tree's one.
+
+        Each shard starts without cost data, so its file holds exactly the
+        tests it ran; tests that never passed there (0 runs) keep the cost
+        recorded before.
+        """
+        rows, _ = self.read_cost_data(self.cost_data_path())
+        failed = []
+        for shard_dir in shard_dirs:
+            shard_rows, shard_failed = self.read_cost_data(shard_dir / "Testing" / "Temporary" / "CTestCostData.txt")
+            rows.update((name, row) for name, row in shard_rows.items() if row[1] != "0" or name not in rows)
+            failed.extend(shard_failed)
+        cost_file = self.cost_data_path()
+        cost_file.parent.mkdir(parents=True, exist_ok=True)
+        cost_file.write_text("".join(" ".join(row) + "\n" for row in rows.values())
+                             + "---\n" + "".join(name + "\n" for name in failed))
+
+    def shard_tests(self, n_shards: int) -> list[list[int]]:
+        """Split the ctest test set into at most `n_shards` index lists.
+
+        Tests are assigned longest first to the currently lightest shard using
+        the durations from the previous run. Tests without a recorded duration
+        count as the average so new tests still spread across shards.
+        """
+        names = self.list_ctest_tests()
+        if not names:
+            return []
+        costs = self.read_test_costs()
+        known = [costs[n] for n in names if n in costs]
+        default = sum(known) / len(known) if known else 1.0
+        order = sorted(range(1, len(names) + 1), key=lambda i: costs.get(names[i - 1], default), reverse=True)
+        heap = [(0.0, shard) for shard in range(max(1, n_shards))]
+        buckets: list[list[int]] = [[] for _ in heap]
+        for index in order:
+            load, shard = heapq.heappop(heap)
+            buckets[shard].append(index)
+            heapq.heappush(heap, (load + costs.get(names[index - 1], default), shard))
+        return [sorted(b) for b in buckets if b]
+
+    def run_sharded_ctest_tests(self) -> tuple[int, list[str]]:
+        """Run the test set as concurrent ctest processes, one per shard.
+
+        Every shard runs from its own directory under the build tree's
+        Testing/, whose CTestTestfile.cmake only includes the runner
+        directory. Test numbers and working directories stay those of the
+        runner directory, while each ctest writes its own LastTest.log and
+        CTestCostData.txt; the cost data is merged back afterwards.
+
+        With ctest 3.21 or newer each shard writes its own JUnit report.
+        Returns the first non-zero return code (or 0) and the failures
+        scraped from all shards.
+        """
+        shards = self.shard_tests(self.test_jobs)
+        if len(shards) <= 1:
+            return self.run_ctest_tests()
+        jobs = max(1, self.test_jobs // len(shards))
+        build_testing = Path(self.runner["build_path"]) / "Testing"
+        tests_dir = Path(self.runner["execute_path"]).resolve().as_posix()
+        shard_dirs = [build_testing / f"shard-{i}" for i in range(len(shards))]
+        for shard_dir in shard_dirs:
+            (shard_dir / "Testing" / "Temporary").mkdir(parents=True, exist_ok=True)
+            (shard_dir / "CTestTestfile.cmake").write_text(f'subdirs("{tests_dir}")\n')
+            # start empty so the file ends up holding only this shard's tests
+            (shard_dir / "Testing" / "Temporary" / "CTestCostData.txt").unlink(missing_ok=True)
+        self.test_logs = [shard_dir / "Testing" / "Temporary" / "LastTest.log" for shard_dir in shard_dirs]
+        reports = [build_testing / f"junit-{i}.xml" for i in range(len(shards))]
+        junit_flags = [self.junit_flags(report) for report in reports]
+        self.junit_reports = reports if junit_flags[0] else []
+
+        def run_shard(i: int):
+            # "-I 0,0,0,<n>,..." selects exactly the listed test numbers
+            selection = ",".join(["0", "0", "0"] + [str(n) for n in shards[i]])
+            cmd = ["ctest", "--output-on-failure", f"-j{jobs}", "-I", selection, *junit_flags[i]]
+            scanner = CtestFailureScanner()
+            returncode = self.run_streaming(cmd, cwd=shard_dirs[i], on_line=scanner.feed)
+            return returncode, scanner.failures
+
+        # The shards are separate ctest processes, so threads are enough to
+        # wait on them concurrently.
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            results = list(pool.map(run_shard, range(len(shards))))
+        self.merge_test_costs(shard_dirs)
+        returncode = next((code for code, _ in results if code != 0), 0)
+        return returncode, [name for _, failures in results for name in failures]
+
     def has_failed(self) -> bool:
         return bool(self._failed)
     
 
+    def resolve_command(self, cmd: list[str]) -> list[str]:
+        """Return cmd with a bare program name replaced by its path on PATH."""
+        if not cmd or os.sep in cmd[0]:
+            return cmd
+        env = self.env if self.env is not None else os.environ
+        return [_which(cmd[0], env.get("PATH")), *cmd[1:]]
+
     def run(self, cmd, cwd=None, capture_output=False):
         print(f"+ Running: {' '.join(cmd)} (cwd={cwd})")
+        cmd = self.resolve_command(cmd)
         if capture_output:
-            return subprocess.run(cmd, cwd=cwd, env=self.env, text=True, capture_output=True)
+            # capture raw bytes and decode each stream once as UTF-8; tool output
+            # is not guaranteed to match the locale encoding
+            result = subprocess.run(cmd, cwd=cwd, env=self.env, capture_output=True)
+            result.stdout = result.stdout.decode("utf-8", "replace")
+            result.stderr = result.stderr.decode("utf-8", "replace")
+            return result
         subprocess.run(cmd, cwd=cwd, check=True, env=self.env)
         return None
 
+    def run_streaming(self, cmd, cwd=None, on_line=None) -> int:
+        """Run cmd, echoing its combined output line by line, and return its exit code.
+
+        Each line is also passed to `on_line` as it arrives, so nothing is kept
+        in memory once it has been printed.
+        """
+        print(f"+ Running: {' '.join(cmd)} (cwd={cwd})")
+        cmd = self.resolve_command(cmd)
+        with subprocess.Popen(cmd, cwd=cwd, env=self.env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              text=True, encoding="utf-8", errors="replace", bufsize=1) as proc:
+            for line in proc.stdout:
+                print(line, end="")
+                if on_line is not None:
+                    on_line(line)
+        return proc.returncode
+
+
+    def junit_report_path(self) -> Path:
+        return Path(self.runner["build_path"]) / "Testing" / "junit.xml"
 
-    def parse_ctest_failures(self, output: str):
+    def collect_junit_failures(self) -> list[str] | None:
+        """Return failed tests from all reports of the last ctest run, or
+        None if it wrote none.
+        """
+        if not self.junit_reports:
+            return None
         failures = []
-        capture = False
-        for line in output.splitlines():
-            if line.startswith("The following tests FAILED:"):
-                capture = True
-                continue
-            if capture:
-                stripped = line.strip()
-                if not stripped:
-                    break
-                # Expected format: "<index> - <name> (<time>)"
-                if "-" in stripped:
-                    parts = stripped.split("-", 1)
-                    if len(parts) == 2:
-                        failures.append(parts[1].strip().split(" ")[0])
+        for report in self.junit_reports:
+            found = self.parse_junit_failures(report)
+            if found is None:
+                return None
+            failures.extend(found)
         return failures
+
+    def parse_junit_failures(self, report: Path) -> list[str] | None:
+        """Return names of failed testcases in a ctest JUnit report.
+
+        Returns None if the report is missing or unreadable so the caller can
+        fall back to scraping the ctest output.
+        """
+        failures = []
+        try:
+            for _, elem in ET.iterparse(report, events=("end",)):
+                if elem.tag != "testcase":
+                    continue
+                if elem.find("failure") is not None:
+                    failures.append(elem.get("name", ""))
+                elem.clear()
+        except (OSError, ET.ParseError):
+            return None
+        return failures
+
+    def parse_ctest_failures(self, output: str | bytes):
+        if isinstance(output, bytes):
+            output = output.decode("utf-8", "replace")
+        scanner = CtestFailureScanner()
+        # iterate lazily: the failure list ends at the first blank line, so
+        # the rest of the log never needs to be split
+        for line in io.StringIO(output):
+            scanner.feed(line)
+            if scanner.done:
+                break
+        return scanner.failures
     
 
     def get_cores(self, max_allowed: int | None) -> int:
@@ -222,42 +754,42 @@ class TestRunner:
         return allowed if allowed < detected else detected
 
 
+# Yocto/SDK environment variables removed so CMake does not default to a target toolchain.
+_SDK_ENV_KEYS = frozenset({
+    "CMAKE_TOOLCHAIN_FILE",
+    "OECORE_NATIVE_SYSROOT",
+    "OECORE_TARGET_SYSROOT",
+    "OECORE_BASELIB",
+    "OECORE_TARGET_ARCH",
+    "OECORE_TARGET_OS",
+    "OECORE_TARGET_BITS",
+    "OECORE_TARGET_ENDIANNESS",
+    "OECORE_TARGET_FPU",
+    "OECORE_SDK_VERSION",
+    "OECORE_DISTRO_VERSION",
+    "OECORE_ENV_VERSION",
+    "SDKTARGETSYSROOT",
+    "PKG_CONFIG_SYSROOT_DIR",
+    "PKG_CONFIG_PATH",
+    "PKG_CONFIG_LIBDIR",
+})
+
+_HOST_TOOLCHAIN = {
+    "CC": "/usr/bin/gcc",
+    "CXX": "/usr/bin/g++",
+    "AR": "/usr/bin/ar",
+    "RANLIB": "/usr/bin/ranlib",
+    "STRIP": "/usr/bin/strip",
+    "NM": "/usr/bin/nm",
+    "OBJCOPY": "/usr/bin/objcopy",
+    "OBJDUMP": "/usr/bin/objdump",
+}
+
+
 def build_env(use_host_compiler: bool):
     if not use_host_compiler:
         return None
-
-    env = os.environ.copy()
-    # Remove Yocto/SDK environment variables so CMake does not default to a target toolchain.
-    for key in [
-        "CMAKE_TOOLCHAIN_FILE",
-        "OECORE_NATIVE_SYSROOT",
-        "OECORE_TARGET_SYSROOT",
-        "OECORE_BASELIB",
-        "OECORE_TARGET_ARCH",
-        "OECORE_TARGET_OS",
-        "OECORE_TARGET_BITS",
-        "OECORE_TARGET_ENDIANNESS",
-        "OECORE_TARGET_FPU",
-        "OECORE_SDK_VERSION",
-        "OECORE_DISTRO_VERSION",
-        "OECORE_ENV_VERSION",
-        "SDKTARGETSYSROOT",
-        "PKG_CONFIG_SYSROOT_DIR",
-        "PKG_CONFIG_PATH",
-        "PKG_CONFIG_LIBDIR",
-    ]:
-        env.pop(key, None)
-
-    env.update(
-        {
-            "CC": "/usr/bin/gcc",
-            "CXX": "/usr/bin/g++",
-            "AR": "/usr/bin/ar",
-            "RANLIB": "/usr/bin/ranlib",
-            "STRIP": "/usr/bin/strip",
-            "NM": "/usr/bin/nm",
-            "OBJCOPY": "/usr/bin/objcopy",
-            "OBJDUMP": "/usr/bin/objdump",
-        }
-    )
+    # single pass over the environment; the result is owned by the caller
+    env = {key: value for key, value in os.environ.items() if key not in _SDK_ENV_KEYS}
+    env.update(_HOST_TOOLCHAIN)
     return env
@@ -10,16 +10,26 @@ Functions:
 - get_created_files(path) -> list
 - get_added_files(path) -> list
 - get_modified_files(path) -> list
+- status_snapshot() -> context manager sharing one status between the above
 
 The implementation uses `git status --porcelain -z` which is stable for
 machine parsing and lists staged/unstaged changes as well as untracked files.
+When pygit2 is installed the status is read in-process through libgit2
+instead.
 """
 
 from __future__ import annotations
 
-import codecs
+import contextlib
+import functools
+import os
 import subprocess
-from typing import Dict, List, Set
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+	import pygit2  # optional, reads status in-process through libgit2
+except Exception:
+	pygit2 = None
 
 __all__ = [
 	"get_changed_files",
@@ -27,46 +37,125 @@ __all__ = [
 	"get_added_files",
 	"get_modified_files",
 	"get_repo_root",
+	"status_snapshot",
+	"clear_cache",
 ]
 
+# get_changed_files results served to the get_*_files accessors, keyed by
+# git dir. Only set inside status_snapshot(): no file signal reliably
+# tells when a work tree edit makes a stored result stale.
+_CHANGED_CACHE: Optional[Dict[str, Dict[str, List[str]]]] = None
+
+
+_CREATED, _ADDED, _MODIFIED, _DELETED = 1, 2, 4, 8
+
+
+def _status_flags(status: str) -> int:
+	"""Return the result kinds a porcelain XY status contributes to."""
+	if status == "??":
+		return _CREATED
+	x, y = status[0], status[1]
+	flags = 0
+	if x == "A":
+		flags |= _ADDED | _CREATED
+	if x == "M" or y == "M":
+		flags |= _MODIFIED
+	if x == "D" or y == "D":
+		flags |= _DELETED
+	return flags
+
+
+# Every XY pair git can print, mapped to its result kinds once at import.
+_STATUS_FLAGS: Dict[str, int] = {
+	x + y: _status_flags(x + y) for x in " MTADRCU?" for y in " MTADRCU?"
+}
+
+
+def _decode_path(raw: bytes) -> str:
+	"""Decode a path from git output; bytes that are not UTF-8 survive as
+	surrogate escapes so the name still round-trips to the filesystem."""
+	return raw.decode("utf-8", "surrogateescape")
+
 
 def _run_git_status_porcelain(repo_dir: str) -> List[str]:
-	"""Run `git status --porcelain=v1 -uall` and return list of entries.
+	"""Run `git status --porcelain=v1 -uall -z --no-renames` and return list of entries.
 
-	Each entry is a porcelain line. Lines are either
+	Each entry is a porcelain record. Records are either
 	- '?? <file>' for untracked files, or
 	- 'XY <file>' where X is staged status and Y is unstaged status.
+	With `-z` paths are never quoted. `--no-renames` reports a staged rename
+	as its source deleted and its destination added, as libgit2 does. A
+	rename or copy record still carries its destination; the source path
+	git emits after it is dropped.
 	"""
 	try:
 		proc = subprocess.run(
-			["git", "-C", repo_dir, "status", "--porcelain=v1", "-uall"],
+			["git", "--no-optional-locks", "-C", repo_dir, "status", "--porcelain=v1", "-uall", "-z", "--no-renames"],
 			check=True,
 			capture_output=True,
-			text=True,
 		)
 	except subprocess.CalledProcessError:
 		return []
 
-	return [ln for ln in proc.stdout.splitlines() if ln]
+	entries: List[str] = []
+	skip_source = False
+	for tok in proc.stdout.split(b"\x00"):
+		if skip_source:
+			skip_source = False
+			continue
+		if not tok:
+			continue
+		entries.append(_decode_path(tok))
+		if tok[:1] in (b"R", b"C") or tok[1:2] in (b"R", b"C"):
+			skip_source = True
+	return entries
+
 
+def _status_libgit2(path: str) -> Optional[List[Tuple[int, str]]]:
+	"""Return (flags, file) status entries read through pygit2.
 
-def _run_git_ls_files(repo_dir: str) -> List[str]:
-	"""Run `git ls-files -o --exclude-standard` and return list of entries."""
+	Returns None when pygit2 is not installed or cannot open a work tree
+	for `path`, so the caller falls back to the git command line. libgit2
+	does not detect renames here: a staged rename shows up as its source
+	deleted and its destination added, like the command line's
+	`--no-renames` output.
+	"""
+	if pygit2 is None:
+		return None
 	try:
-		proc = subprocess.run(
-			["git", "-C", repo_dir, "ls-files", "-o", "--exclude-standard"],
-			check=True,
-			capture_output=True,
-			text=True,
-		)
-	except subprocess.CalledProcessError:
-		return []
+		git_dir = pygit2.discover_repository(path)
+		if git_dir is None:
+			return None
+		repo = pygit2.Repository(git_dir)
+		if repo.workdir is None:
+			return None
+		status = repo.status()
+	except Exception:
+		return None
 
-	return [ln for ln in proc.stdout.splitlines() if ln]
+	entries: List[Tuple[int, str]] = []
+	for fname, bits in status.items():
+		flags = 0
+		if bits & pygit2.GIT_STATUS_WT_NEW:
+			flags |= _CREATED
+		if bits & pygit2.GIT_STATUS_INDEX_NEW:
+			flags |= _ADDED | _CREATED
+		if bits & (pygit2.GIT_STATUS_INDEX_MODIFIED | pygit2.GIT_STATUS_WT_MODIFIED):
+			flags |= _MODIFIED
+		if bits & (pygit2.GIT_STATUS_INDEX_DELETED | pygit2.GIT_STATUS_WT_DELETED):
+			flags |= _DELETED
+		if flags:
+			entries.append((flags, fname))
+	return entries
 
 
 def get_repo_root(path: str) -> str | None:
 	"""Return the repository root for a path, or None if not in a repo."""
+	return _repo_root(os.path.abspath(path))
+
+
+@functools.lru_cache(maxsize=None)
+def _repo_root(path: str) -> str | None:
 	try:
 		proc = subprocess.run(
 			["git", "-C", path, "rev-parse", "--show-toplevel"],
@@ -81,87 +170,123 @@ def get_repo_root(path: str) -> str | None:
 	return root or None
 
 
-def _normalize_filename_from_token(tok: str) -> tuple[str, str]:
+def _find_git_dir(path: str) -> str | None:
+	"""Return the git directory of the repository containing `path`.
+
+	Walks up from `path` looking for `.git`; a `.git` file (worktrees,
+	submodules) is followed to the directory it points at.
+	"""
+	current = os.path.abspath(path)
+	while True:
+		dotgit = os.path.join(current, ".git")
+		if os.path.isdir(dotgit):
+			return dotgit
+		if os.path.isfile(dotgit):
+			try:
+				with open(dotgit, encoding="utf-8") as fh:
+					line = fh.readline().strip()
+			except OSError:
+				return None
+			if not line.startswith("gitdir:"):
+				return None
+			return os.path.join(current, line[len("gitdir:"):].strip())
+		parent = os.path.dirname(current)
+		if parent == current:
+			return None
+		current = parent
+
+
+def _get_changed_cached(path: str) -> Dict[str, List[str]]:
+	"""Return `get_changed_files(path)`, reused within the current
+	`status_snapshot()` block for every path of the same repository."""
+	if _CHANGED_CACHE is None:
+		return get_changed_files(path)
+	key = _find_git_dir(path) or os.path.abspath(path)
+	changed = _CHANGED_CACHE.get(key)
+	if changed is None:
+		changed = _CHANGED_CACHE[key] = get_changed_files(path)
+	return changed
+
+
+@contextlib.contextmanager
+def status_snapshot() -> Iterator[None]:
+	"""Share one git status between the get_*_files accessors in the block.
+
+	Callers querying several kinds in a row, such as VerifyFiles, then run
+	git once instead of once per kind. The results are dropped when the
+	outermost block exits.
+	"""
+	global _CHANGED_CACHE
+	outer = _CHANGED_CACHE
+	if outer is None:
+		_CHANGED_CACHE = {}
+	try:
+		yield
+	finally:
+		_CHANGED_CACHE = outer
+
+
+def clear_cache() -> None:
+	"""Forget cached repository roots and changed-file results."""
+	if _CHANGED_CACHE is not None:
+		_CHANGED_CACHE.clear()
+	_repo_root.cache_clear()
+
+
+def _normalize_filename_from_token(tok: str) -> Optional[tuple[str, str]]:
 	"""Return (status, filename) from a porcelain token.
 
-	Handles the simple '?? <file>' case and the 'XY <file>' case. For
-	rename tokens that may contain '->', the destination filename is
-	returned.
+	Handles the simple '?? <file>' case and the 'XY <file>' case. Returns
+	None for a malformed token so it never reaches the result as a file.
 	"""
 	if tok.startswith("?? "):
-		return "??", _unquote_git_path(tok[3:])
+		return "??", tok[3:]
 
 	if len(tok) >= 3 and tok[2] == " ":
-		status = tok[:2]
-		fname = tok[3:]
-		# handle rename formatted as 'R100 from -> to'
-		if " -> " in fname:
-			fname = fname.split(" -> ")[-1]
-		return status, _unquote_git_path(fname)
-
-	# Fallback: return entire token as filename with empty status
-	return "", _unquote_git_path(tok)
+		return tok[:2], tok[3:]
 
-
-def _unquote_git_path(path: str) -> str:
-	"""Return a git porcelain path with optional C-quoting unescaped."""
-	if len(path) >= 2 and path[0] == '"' and path[-1] == '"':
-		return codecs.decode(path[1:-1], "unicode_escape")
-	return path
+	return None
 
 
 def get_changed_files(path: str) -> Dict[str, List[str]]:
 	"""Return changed files under `path` grouped by kind.
 
-	Returned dict has keys: `created`, `added`, `modified`, `deleted`.
+	Returned dict has keys: `created`, `added`, `modified`, `deleted`;
+	each maps to a sorted list.
 	- `created` contains untracked files (git shows as '??') and staged adds.
 	- `added` contains files staged as added (X == 'A').
 	- `modified` contains files modified either staged or unstaged (X or Y == 'M').
 	- `deleted` contains files deleted (X or Y == 'D').
 	"""
-	repo_root = get_repo_root(path)
-	if not repo_root:
-		return {
-			"created": [],
-			"added": [],
-			"modified": [],
-			"deleted": [],
-		}
-
-	lines = _run_git_status_porcelain(repo_root)
-
 	created: Set[str] = set()
 	added: Set[str] = set()
 	modified: Set[str] = set()
 	deleted: Set[str] = set()
 
-	for line in lines:
-		status, fname = _normalize_filename_from_token(line)
-
-		if status == "??":
+	entries = _status_libgit2(path)
+	if entries is None:
+		# Porcelain status paths are always relative to the repository root, so
+		# the root does not need resolving first; `-uall` already lists every
+		# untracked file. Outside a repository git fails and no entries return.
+		lines = _run_git_status_porcelain(path)
+		entries = []
+		for line in lines:
+			res = _normalize_filename_from_token(line)
+			if res is None:
+				continue
+			status, fname = res
+			entries.append((_STATUS_FLAGS.get(status, 0), fname))
+
+	for flags, fname in entries:
+		if flags & _CREATED:
 			created.add(fname)
-			continue
-
-		x = status[0] if len(status) >= 1 else " "
-		y = status[1] if len(status) >= 2 else " "
-
-		if x == "A":
+		if flags & _ADDED:
 			added.add(fname)
-			created.add(fname)
-
-		if x == "M" or y == "M":
+		if flags & _MODIFIED:
 			modified.add(fname)
-
-		if x == "D" or y == "D":
+		if flags & _DELETED:
 			deleted.add(fname)
 
-	for fname in _run_git_ls_files(repo_root):
-		name = fname
-		if name.startswith('./'):
-			name = name[2:]
-		if name:
-			created.add(name)
-
 	return {
 		"created": sorted(created),
 		"added": sorted(added),
@@ -173,9 +298,10 @@ def get_changed_files(path: str) -> Dict[str, List[str]]:
 def get_created_files(path: str) -> List[str]:
 	"""Return files created under `path` (untracked + staged adds).
 
-	This is a convenience wrapper around `get_changed_files`.
+	This is a convenience wrapper around `get_changed_files`; inside a
+	`status_snapshot()` block the result is shared with the other accessors.
 	"""
-	return get_changed_files(path)["created"]
+	return list(_get_changed_cached(path)["created"])
 
 
 def get_added_files(path: str) -> List[str]:
@@ -184,11 +310,11 @@ def get_added_files(path: str) -> List[str]:
 	This does not include untracked files; use `get_created_files` to
 	include untracked files as well.
 	"""
-	return get_changed_files(path)["added"]
+	return list(_get_changed_cached(path)["added"])
 
 
 def get_modified_files(path: str) -> List[str]:
 	"""Return files modified (staged or unstaged) under `path`.
 	"""
-	return get_changed_files(path)["modified"]
+	return list(_get_changed_cached(path)["modified"])
 
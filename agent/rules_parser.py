@@ -6,8 +6,78 @@ returns the `test_runner` dictionary for the requested project type or `None`.
 """
 from pathlib import Path
 import json
+import mmap
 import os
-from typing import Any, Dict, Optional
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson  # optional, faster JSON decoding
+except Exception:
+    orjson = None
+
+# Parsed rules per file, reused while the file's mtime and size are unchanged.
+_RULES_CACHE: Dict[Path, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+# Rules files at least this large are mapped rather than read into a copy.
+_MMAP_MIN_BYTES = 1 << 20
+
+
+def _loads(data: bytes | memoryview) -> Any:
+    """Parse JSON bytes with orjson when installed, else the stdlib.
+
+    Both raise a json.JSONDecodeError (orjson's error subclasses it).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data))
+
+
+def _load_file(path: Path, size: int) -> Any:
+    """Parse the JSON file at `path`; large files are parsed straight from
+    an mmap of the file instead of a bytes copy of it."""
+    if size < _MMAP_MIN_BYTES:
+        return _loads(path.read_bytes())
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            return _loads(view)
+
+
+def _project_entries(projects: Any) -> List[Dict[str, Any]]:
+    """Return `project_configurations` as a list of project dicts.
+
+    Accepts a list of project objects, a single project object, or a
+    mapping of project name to project object (the name becomes the
+    `project_type` when the object has none).
+    """
+    if isinstance(projects, dict):
+        if 'project_type' in projects:
+            return [projects]
+        entries = []
+        for key, value in projects.items():
+            if isinstance(value, dict):
+                entry = dict(value)
+                entry.setdefault('project_type', key)
+                entries.append(entry)
+        return entries
+    if isinstance(projects, list):
+        return [p for p in projects if isinstance(p, dict)]
+    return []
+
+
+class ProjectConfig:
+    """The rule sections of one project entry, looked up once at load."""
+
+    __slots__ = ("project_type", "test_runner", "test_builder", "file_rules", "cpp_code_rules", "cmake_rules")
+
+    def __init__(self, entry: Dict[str, Any]):
+        framework = entry.get("testframework") or {}
+        self.project_type = entry.get("project_type")
+        self.test_runner = framework.get("test_runner")
+        self.test_builder = framework.get("test_builder")
+        self.file_rules = entry.get("file_rules")
+        self.cpp_code_rules = entry.get("cpp_code_rules")
+        self.cmake_rules = entry.get("cmake_rules")
 
 
 class RulesParser:
@@ -23,25 +93,53 @@ class RulesParser:
         self.rules_path = Path(rules_path) if rules_path else script_dir / ".agent_rules.json"
         if not self.rules_path.is_file():
             raise FileNotFoundError(f"rules file not found: {self.rules_path}")
-        self.rules = self.load_rules()
+        self.rules = self._load_cached(self.rules_path)
+        self._entries = _project_entries(self.rules.get("project_configurations", []))
+        # lowercased project_type -> entry; first entry wins, matching the
+        # lookup order of a linear scan
+        self._by_type: Dict[str, Dict[str, Any]] = {}
+        for pc in self._entries:
+            self._by_type.setdefault(sys.intern(str(pc.get("project_type", "")).lower()), pc)
+        self._configs: Dict[str, ProjectConfig] = {key: ProjectConfig(pc) for key, pc in self._by_type.items()}
 
     def load_rules(self) -> Dict[str, Any]:
-        with self.rules_path.open() as fh:
-            return json.load(fh)
+        return _loads(self.rules_path.read_bytes())
+
+    @staticmethod
+    def _load_cached(path: Path) -> Dict[str, Any]:
+        """Return the parsed rules in `path`, parsing only if the file changed.
+
+        The returned dict is shared between RulesParser instances, and so
+        are the sections the get_* methods hand out: callers must copy
+        before modifying anything (VerifyFiles once appended to the cached
+        allowed_to_modify list, growing it on every run). Set RULES_PARSER_NOCACHE=1 to always re-parse, e.g.
+        when a file may be rewritten within one mtime tick at the same size.
+        """
+        st = path.stat()
+        if os.environ.get("RULES_PARSER_NOCACHE") == "1":
+            return _load_file(path, st.st_size)
+        key = path.resolve()
+        version = (st.st_mtime_ns, st.st_size)
+        cached = _RULES_CACHE.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rules = _load_file(path, st.st_size)
+        _RULES_CACHE[key] = (version, rules)
+        return rules
 
     def get_test_runner(self, project_type: str) -> Optional[Dict[str, Any]]:
         """Return the `test_runner` dict for `project_type`, or None if missing."""
-        for pc in self.rules.get("project_configurations", []):
-            if pc.get("project_type") == project_type:
-                return pc.get("testframework", {}).get("test_runner")
-        return None
+        try:
+            return self._configs[project_type.lower()].test_runner
+        except (KeyError, AttributeError):  # unknown or None project_type
+            return None
 
     def get_test_builder(self, project_type: str) -> Optional[Dict[str, Any]]:
         """Return the `test_builder` dict for `project_type`, or None if missing."""
-        for pc in self.rules.get("project_configurations", []):
-            if pc.get("project_type") == project_type:
-                return pc.get("testframework", {}).get("test_builder")
-        return None
+        try:
+            return self._configs[project_type.lower()].test_builder
+        except (KeyError, AttributeError):
+            return None
 
     def get_file_rules(self, project_type: str) -> Optional[Dict[str, Any]]:
         """Return the `file_rules` dict for `project_type`, or None if missing.
@@ -49,10 +147,10 @@ class RulesParser:
         This method returns the `file_rules` entry exactly as found in
         the loaded `.agent_rules.json` for the matching project type.
         """
-        for pc in self.rules.get("project_configurations", []):
-            if pc.get("project_type") == project_type:
-                return pc.get("file_rules")
-        return None
+        try:
+            return self._configs[project_type.lower()].file_rules
+        except (KeyError, AttributeError):
+            return None
 
     def get_cpp_code_rules(self, project_type: str) -> Optional[Dict[str, Any]]:
         """Return the `cpp_code_rules` dict for `project_type`, or None if missing.
@@ -60,10 +158,10 @@ class RulesParser:
         This returns the `cpp_code_rules` entry from the loaded
         `.agent_rules.json` for the matching project type.
         """
-        for pc in self.rules.get("project_configurations", []):
-            if pc.get("project_type") == project_type:
-                return pc.get("cpp_code_rules")
-        return None
+        try:
+            return self._configs[project_type.lower()].cpp_code_rules
+        except (KeyError, AttributeError):
+            return None
 
     def get_cmake_rules(self, project_type: str) -> Optional[Dict[str, Any]]:
         """Return the `cmake_rules` dict for `project_type`, or None if missing.
@@ -71,10 +169,10 @@ class RulesParser:
         Returns the `cmake_rules` entry from the loaded
         `.agent_rules.json` for the matching project type.
         """
-        for pc in self.rules.get("project_configurations", []):
-            if pc.get("project_type") == project_type:
-                return pc.get("cmake_rules")
-        return None
+        try:
+            return self._configs[project_type.lower()].cmake_rules
+        except (KeyError, AttributeError):
+            return None
 
     def load_project_config(self, project_type: Optional[str]) -> dict:
         """Return a project configuration from the already-loaded rules.
@@ -83,25 +181,9 @@ class RulesParser:
         or json.JSONDecodeError on error. The FileNotFoundError will have
         been raised during construction if the rules file was missing.
         """
-        rules = self.rules
-        projects = rules.get('project_configurations', [])
-        if not projects:
+        if not self.rules.get('project_configurations'):
             raise ValueError('No project_configurations found in .agent_rules.json')
-
-        if isinstance(projects, dict):
-            if 'project_type' in projects:
-                project_entries = [projects]
-            else:
-                project_entries = []
-                for key, value in projects.items():
-                    if isinstance(value, dict):
-                        entry = dict(value)
-                        entry.setdefault('project_type', key)
-                        project_entries.append(entry)
-        elif isinstance(projects, list):
-            project_entries = [p for p in projects if isinstance(p, dict)]
-        else:
-            project_entries = []
+        project_entries = self._entries
         if not project_entries:
             raise ValueError('project_configurations must contain objects with project_type')
 
@@ -110,11 +192,9 @@ class RulesParser:
                 return project_entries[0]
             raise ValueError('Multiple project_configurations found; use --project to select one')
 
-        project_key = project_type.lower()
-        for project in project_entries:
-            candidate = str(project.get('project_type', '')).lower()
-            if candidate == project_key:
-                return project
+        project = self._by_type.get(project_type.lower())
+        if project is not None:
+            return project
 
         available = ', '.join(sorted({str(p.get('project_type', '')).lower() for p in project_entries if p.get('project_type')}))
         raise ValueError(f"Unknown project type '{project_type}'. Available: {available}")
@@ -0,0 +1,243 @@
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+from dataclasses import dataclass
+
+import pytest
+
+import build_and_run_tests as br
+from rules_parser import RulesParser, _loads
+
+
+# Canonical rules shared by the tests. `rules.json` holds several projects
+# in list form; `.agent_rules.json` holds a single project in mapping form.
+RULES = {
+    "project_configurations": [
+        {
+            "project_type": "myproj",
+            "testframework": {
+                "test_runner": {"execute_path": "exec", "command": "run"},
+                "test_builder": {"execute_path": "build", "command": "make"},
+            },
+            "file_rules": {
+                "allowed_to_modify": ["zephyr_main_app/ztests/"],
+                "ignored_files": ["*.md", "*.txt"]
+            },
+            "cpp_code_rules": {
+                "not_allowed_header_includes": ["zephyr.h"],
+                "not_allowed_include_extensions": [".cpp"]
+            },
+            "cmake_rules": {
+                "cmake_overall_guidelines": {"allow_absolute_paths": False, "allow_FILE_function": False},
+                "not_allowed_cmake_include_dirs": ["tests/unit_tests"]
+            }
+        },
+        {
+            "project_type": "dti_tools",
+            "testframework": {
+                "test_builder": {"execute_path": "proj", "command": "make", "gcc_builder": True},
+                "test_runner": {"execute_path": "proj", "command": "ctest"},
+            },
+        },
+        {"project_type": "other"},
+    ]
+}
+
+SINGLE_PROJECT_RULES = {
+    "project_configurations": {
+        "myproj": {"project_type": "myproj", "testframework": {"test_runner": {"command": "run"}}}
+    }
+}
+
+
+@pytest.fixture(scope="session")
+def rules_template(tmp_path_factory):
+    """Directory with the rules files, written once per test session."""
+    template = tmp_path_factory.mktemp("rules_template")
+    (template / "rules.json").write_bytes(json.dumps(RULES).encode("utf-8"))
+    (template / ".agent_rules.json").write_bytes(json.dumps(SINGLE_PROJECT_RULES).encode("utf-8"))
+    return template
+
+
+@pytest.fixture
+def rules_dir(tmp_path, rules_template):
+    """A private copy of the rules files under the test's tmp_path."""
+    target = tmp_path / "rules"
+    shutil.copytree(rules_template, target, dirs_exist_ok=True)
+    return target
+
+
+@pytest.fixture(scope="session")
+def rules_data(rules_template):
+    """The template's rules.json, parsed once per session (orjson when
+    installed, like RulesParser). Treat as read-only."""
+    return _loads((rules_template / "rules.json").read_bytes())
+
+
+@pytest.fixture
+def rp_factory(rules_template):
+    """Build a RulesParser over a session template file.
+
+    The template is never modified, so RulesParser's file cache parses each
+    file once per session. Tests that rewrite rules use rules_dir instead.
+    """
+    def _make(name="rules.json"):
+        return RulesParser(rules_template / name)
+    return _make
+
+
+@pytest.fixture(scope="module")
+def shared_rp(tmp_path_factory):
+    """One RulesParser with a single "myproj" project allowed to modify
+    src/, shared by a module's tests. Tests that rewrite the rules file
+    build their own.
+    """
+    path = tmp_path_factory.mktemp("shared_rules") / ".agent_rules.json"
+    path.write_bytes(b'{"project_configurations": [{"project_type": "myproj", '
+                     b'"file_rules": {"allowed_to_modify": ["src/"]}}]}')
+    return RulesParser(path)
+
+
+@pytest.fixture
+def mkdirs(tmp_path):
+    """Create directories relative to tmp_path in one call; returns the paths."""
+    def _mk(*subs):
+        paths = [tmp_path / sub for sub in subs]
+        for path in paths:
+            path.mkdir(parents=True, exist_ok=True)
+        return paths
+    return _mk
+
+
+@contextlib.contextmanager
+def _captured():
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        yield buf
+
+
+@pytest.fixture
+def captured():
+    """Collect stdout in a StringIO: `with captured() as out: ...`.
+
+    Cheaper than capsys for tests that only check printed text; tests
+    that need stderr keep using capsys.
+    """
+    return _captured
+
+
+@dataclass(slots=True)
+class FakeResult:
+    """A finished process as returned by subprocess.run or TestRunner.run."""
+    returncode: int = 0
+    stdout: str | bytes = ""
+    stderr: str | bytes = ""
+
+
+class FakeRun:
+    """Stand-in for subprocess.run answering from a table of canned results.
+
+    `set(word, result)` answers any command containing `word` (e.g. "status",
+    "ls-files") with `result`, or raises it when it is an exception. Commands
+    with no entry fail like a git error. Every command is kept in `calls`.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.calls = []
+
+    @staticmethod
+    def result(stdout=b"", returncode=0, stderr=b""):
+        return FakeResult(returncode, stdout, stderr)
+
+    def set(self, word, result):
+        self.results[word] = result
+        return result
+
+    def dispatch(self, cmd, *args, **kwargs):
+        self.calls.append(cmd)
+        # callers may resolve the program to its full path first
+        words = set(cmd) | {os.path.basename(cmd[0])} if isinstance(cmd, list) and cmd else cmd
+        for word, result in self.results.items():
+            if word in words:
+                if isinstance(result, BaseException):
+                    raise result
+                return result
+        raise subprocess.CalledProcessError(1, cmd)
+
+
+@pytest.fixture
+def fake_subprocess(monkeypatch):
+    """Route subprocess.run to a FakeRun for the duration of the test."""
+    fake = FakeRun()
+    monkeypatch.setattr(subprocess, "run", fake.dispatch)
+    return fake
+
+
+class FakeTestRunner(br.TestRunner):
+    """TestRunner whose processes are answered by per-instance fakes.
+
+    `_run_impl(cmd, cwd=None, capture_output=False)` answers `run` and
+    `_stream_impl(cmd, cwd=None, on_line=None)` answers `run_streaming`;
+    by default every command succeeds silently. `returns` and `streams`
+    install canned answers, and every command is kept in `calls`.
+    """
+
+    Result = FakeResult
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    @staticmethod
+    def _run_impl(cmd, cwd=None, capture_output=False):
+        return FakeResult()
+
+    @staticmethod
+    def _stream_impl(cmd, cwd=None, on_line=None):
+        return 0
+
+    def returns(self, result):
+        """Answer every `run` with `result`."""
+        self._run_impl = lambda cmd, **kwargs: result
+
+    def streams(self, output, returncode):
+        """Answer every `run_streaming` by feeding `output` line by line."""
+        def _stream(cmd, cwd=None, on_line=None):
+            for line in output.splitlines(keepends=True):
+                on_line(line)
+            return returncode
+        self._stream_impl = _stream
+
+    def run(self, cmd, cwd=None, capture_output=False, **kwargs):
+        self.calls.append(cmd)
+        return self._run_impl(cmd, cwd=cwd, capture_output=capture_output)
+
+    def run_streaming(self, cmd, cwd=None, on_line=None):
+        self.calls.append(cmd)
+        return self._stream_impl(cmd, cwd=cwd, on_line=on_line)
+
+
+@pytest.fixture
+def fake_test_runner():
+    """The FakeTestRunner class, for tests that construct their own runners."""
+    return FakeTestRunner
+
+
+@pytest.fixture(scope="session")
+def verify_agent_mod():
+    """agent/verify_agent.py loaded as a script module, executed once per session.
+
+    Tests patch its attributes through monkeypatch or mock.patch, which
+    restore them on teardown, so sharing the module is safe.
+    """
+    mod_path = pathlib.Path(__file__).resolve().parents[1] / "verify_agent.py"
+    spec = importlib.util.spec_from_file_location("verify_agent", str(mod_path))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
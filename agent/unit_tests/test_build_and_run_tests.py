@@ -7,59 +7,30 @@ from pathlib import Path
 
 import pytest
 
+import build_and_run_tests as br
+
+# core count as seen at import, shared by the tests that compare against it
+_DETECTED_CORES = multiprocessing.cpu_count()
+
 
-import importlib.util
-
-
-def _br_module():
-    # Load the module from the agent package path to prefer the user's current file
-    root = Path(__file__).resolve().parents[2]
-    mod_path = root / "agent" / "build_and_run_tests.py"
-    spec = importlib.util.spec_from_file_location("build_and_run_tests", str(mod_path))
-    mod = importlib.util.module_from_spec(spec)
-    # Ensure repo root is on sys.path so package imports inside the module work
-    old_sys_path = list(sys.path)
-    sys.path.insert(0, str(root))
-    try:
-        spec.loader.exec_module(mod)
-    finally:
-        sys.path[:] = old_sys_path
-    return mod
-
-
-br = _br_module()
-
-
-
-def test_load_rules_and_get_execute_path(tmp_path):
-    rules = {
-        "project_configurations": [
-            {
-                "project_type": "myproj",
-                "testframework": {"test_builder": {"execute_path": "exec", "command": "cmd"}},
-            }
-        ]
-    }
-    f = tmp_path / "rules.json"
-    f.write_text(json.dumps(rules))
-    # Prefer RulesParser class if available
-    if hasattr(br, "RulesParser"):
-        rp = br.RulesParser(f)
-        tb = rp.get_test_builder("myproj")
-        assert tb["execute_path"] == "exec"
-        assert tb["command"] == "cmd"
-    else:
-        loaded = br.load_rules(f)
-        exec_path, cmd = br.get_execute_path(loaded, "myproj")
-        assert exec_path == "exec"
-        assert cmd == "cmd"
 
+@pytest.mark.parametrize(
+    "project, exec_path, cmd",
+    [("myproj", "build", "make"), ("dti_tools", "proj", "make")],
+)
+def test_load_rules_and_get_execute_path(rules_dir, project, exec_path, cmd):
+    # build_and_run_tests takes its configuration from the standalone parser
+    import rules_parser as rpmod
 
-def test_get_project_dir_abs_rel_and_missing(tmp_path):
-    repo = tmp_path / "repo"
-    repo.mkdir()
-    exec_abs = tmp_path / "absdir"
-    exec_abs.mkdir()
+    rp = rpmod.RulesParser(rules_dir / "rules.json")
+    tb = rp.get_test_builder(project)
+    assert tb["execute_path"] == exec_path
+    assert tb["command"] == cmd
+    assert rp.get_test_builder("other") is None
+
+
+def test_get_project_dir_abs_rel_and_missing(mkdirs):
+    repo, exec_abs, rel = mkdirs("repo", "absdir", "repo/sub")
 
     # absolute/relative path resolution — mirror the logic in the module
     execute_path_value = Path(str(exec_abs))
@@ -69,8 +40,6 @@ def test_get_project_dir_abs_rel_and_missing(tmp_path):
         p = (repo / execute_path_value).resolve()
     assert p == exec_abs.resolve()
 
-    rel = repo / "sub"
-    rel.mkdir()
     execute_path_value = Path("sub")
     if execute_path_value.is_absolute():
         p2 = execute_path_value.resolve()
@@ -86,15 +55,12 @@ def test_get_project_dir_abs_rel_and_missing(tmp_path):
             raise FileNotFoundError()
 
 
-def test_make_framework_entry_and_errors(tmp_path):
+def test_make_framework_entry_and_errors(tmp_path, mkdirs):
     runner = br.TestRunner()
     # override repo_root to tmp
     runner.repo_root = tmp_path
 
-    exec_dir = tmp_path / "exec"
-    build_dir = tmp_path / "build"
-    exec_dir.mkdir()
-    build_dir.mkdir()
+    exec_dir, build_dir = mkdirs("exec", "build")
 
     # valid builder
     runner.make_framework_entry(True, "cmd", str(exec_dir), str(build_dir), ["-O2"])
@@ -106,28 +72,43 @@ def test_make_framework_entry_and_errors(tmp_path):
     runner.make_framework_entry(True, "", str(exec_dir), str(build_dir), None, use_gcc_builder=True)
     assert runner.use_gcc_builder is True
 
-    # invalid is_builder type
-    with pytest.raises(TypeError):
-        runner.make_framework_entry("notbool", "cmd", str(exec_dir), str(build_dir), [])
 
-    # missing execute_path/build_path
-    with pytest.raises(ValueError):
-        runner.make_framework_entry(True, "cmd", "", str(build_dir), [])
-    with pytest.raises(ValueError):
-        runner.make_framework_entry(True, "cmd", str(exec_dir), "", [])
+@pytest.mark.parametrize(
+    "is_builder, exec_p, build_p, expected",
+    [
+        # invalid is_builder type
+        ("notbool", "exec", "build", TypeError),
+        # missing execute_path/build_path
+        (True, "", "build", ValueError),
+        (True, "exec", "", ValueError),
+    ],
+    ids=["is_builder_type", "no_execute_path", "no_build_path"],
+)
+def test_make_framework_entry_invalid(tmp_path, mkdirs, is_builder, exec_p, build_p, expected):
+    runner = br.TestRunner()
+    runner.repo_root = tmp_path
+    mkdirs("exec", "build")
+
+    with pytest.raises(expected):
+        runner.make_framework_entry(
+            is_builder,
+            "cmd",
+            str(tmp_path / exec_p) if exec_p else "",
+            str(tmp_path / build_p) if build_p else "",
+            [],
+        )
 
 
-def sample_ctest_output():
-    return (
-        "Some header\nThe following tests FAILED:\n"
-        " 1 - test_one (0.01 sec)\n"
-        " 2 - test_two (0.02 sec)\n\n"
-        "Some footer\n"
-    )
+SAMPLE_CTEST_OUTPUT = (
+    "Some header\nThe following tests FAILED:\n"
+    " 1 - test_one (0.01 sec)\n"
+    " 2 - test_two (0.02 sec)\n\n"
+    "Some footer\n"
+)
 
 
 def test_parse_ctest_failures_module_and_method():
-    out = sample_ctest_output()
+    out = SAMPLE_CTEST_OUTPUT
     # prefer instance method
     if hasattr(br, "TestRunner"):
         tr = br.TestRunner()
@@ -140,13 +121,25 @@ def test_parse_ctest_failures_module_and_method():
         pytest.skip("No ctest parser available")
 
 
+# many-failure ctest summary, built once at import
+MANY_FAILURES_CTEST_OUTPUT = "The following tests FAILED:\n" + "\n".join(
+    f"  {i} - Test{i} (Failed)" for i in range(1000)
+) + "\n"
+
+
+def test_parse_ctest_failures_many_failures():
+    failures = br.TestRunner().parse_ctest_failures(MANY_FAILURES_CTEST_OUTPUT)
+    assert len(failures) == 1000
+    assert failures[0] == "Test0" and failures[-1] == "Test999"
+
+
 def test_build_env_and_get_cores():
     env = br.build_env(True)
     assert isinstance(env, dict)
     assert "CXX" in env
     assert br.build_env(False) is None
 
-    detected = multiprocessing.cpu_count()
+    detected = _DETECTED_CORES
     if hasattr(br, "TestRunner"):
         tr = br.TestRunner()
         assert tr.get_cores(None) == detected
@@ -160,6 +153,22 @@ def test_build_env_and_get_cores():
         pytest.skip("No get_cores available")
 
 
+def test_git_repo_root_walks_up_without_git(tmp_path, monkeypatch):
+    root = tmp_path / "repo"
+    nested = root / "a" / "b"
+    nested.mkdir(parents=True)
+    (root / ".git").write_text("gitdir: elsewhere\n")
+
+    def no_git(*args, **kwargs):
+        raise AssertionError("git should not be spawned")
+
+    monkeypatch.setattr(br.subprocess, "run", no_git)
+    br._git_repo_root.cache_clear()
+    assert br.git_repo_root(nested) == root.resolve()
+    assert br.git_repo_root(str(nested)) == root.resolve()
+    assert br._git_repo_root.cache_info().hits == 1
+
+
 def test_clean_build_dirs(tmp_path):
     # prefer class method if available
     if hasattr(br, "TestRunner"):
@@ -173,109 +182,281 @@ def test_clean_build_dirs(tmp_path):
         assert ud.exists() and id.exists()
 
 
-def test_run_build_success_and_failure(tmp_path, monkeypatch):
+def test_run_build_success_and_failure(tmp_path, fake_test_runner):
     # Ensure clean environment
     project = tmp_path / "proj"
-    project.mkdir()
-
-    # monkeypatch run to no-op (simulate success)
-    def fake_run(cmd, cwd=None, env=None, capture_output=False, **kwargs):
-        class R:
-            returncode = 0
-            stdout = ""
+    os.makedirs(project)
+
+    # the fake runner's commands succeed by default
+    tr = fake_test_runner()
+    tr.repo_root = project
+    tr.builder = {"build_path": project / "build", "execute_path": project, "command": ""}
+    tr.make_build()
+    assert os.path.isdir(f"{project}/build")
+
+    # simulate failure: the build command exits non-zero; invoking
+    # make_build should handle the error (no uncaught exception)
+    tr2 = fake_test_runner()
+    tr2.returns(tr2.Result(1, stderr="failed"))
+    tr2.builder = {"build_path": project / "build", "execute_path": project, "command": ""}
+    tr2.use_gcc_builder = True
+    tr2.make_build()
+
+
+def test_gcc_builder_uses_compiler_launcher(tmp_path, monkeypatch, fake_test_runner):
+    monkeypatch.setattr(br.shutil, "which", lambda name: "/usr/bin/ccache" if name == "ccache" else None)
+
+    tr = fake_test_runner()
+    tr.builder = {"build_path": tmp_path / "build", "execute_path": tmp_path, "command": "", "compiler_flags": ["-DX=1"]}
+    tr.use_gcc_builder = True
+    tr.make_build()
+    assert "-DCMAKE_CXX_COMPILER_LAUNCHER=/usr/bin/ccache" in tr.calls[0]
+    assert tr.calls[0][-1] == "-DX=1"
+
+    tr_no_cache = fake_test_runner(use_ccache=False)
+    tr_no_cache.builder = tr.builder
+    tr_no_cache.use_gcc_builder = True
+    tr_no_cache.make_build()
+    calls = tr_no_cache.calls
+    assert not any("LAUNCHER" in arg for arg in calls[0])
+    assert "-G" not in calls[0]
+    assert calls[1][:2] == ["cmake", "--build"]
+
+
+def test_gcc_builder_uses_ninja_when_available(tmp_path, monkeypatch, fake_test_runner):
+    monkeypatch.setattr(br.shutil, "which", lambda name: "/usr/bin/ninja" if name == "ninja" else None)
+
+    tr = fake_test_runner()
+    tr.builder = {"build_path": tmp_path / "build", "execute_path": tmp_path, "command": "", "compiler_flags": []}
+    tr.use_gcc_builder = True
+    tr.make_build()
+    calls = tr.calls
+    assert calls[0][calls[0].index("-G") + 1] == "Ninja"
+    assert calls[1] == ["cmake", "--build", str(tmp_path / "build"), f"-j{tr.cores}"]
+
+
+def test_distcc_chained_after_cache_when_hosts_set(monkeypatch):
+    monkeypatch.setattr(br.shutil, "which", lambda name: f"/usr/bin/{name}" if name in ("ccache", "distcc") else None)
+    tr = br.TestRunner()
+    tr.cores = 4
+    tr.env.pop("DISTCC_HOSTS", None)
+    tr.env.pop("DISTCC_JOBS", None)
+    assert tr.compiler_launcher_flags()[1] == "-DCMAKE_CXX_COMPILER_LAUNCHER=/usr/bin/ccache"
+    assert tr.build_jobs() == 4
+
+    tr.env["DISTCC_HOSTS"] = "localhost buildbox"
+    assert tr.compiler_launcher_flags()[1] == "-DCMAKE_CXX_COMPILER_LAUNCHER=/usr/bin/ccache;/usr/bin/distcc"
+    assert tr.build_jobs() == 16
+    tr.env["DISTCC_JOBS"] = "40"
+    assert tr.build_jobs() == 40
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="posix_fadvise not available")
+def test_prefetch_sources_skips_build_and_dot_dirs(tmp_path, monkeypatch):
+    for rel in ["CMakeLists.txt", "src/a.cpp", "buildtools/gen.py", "out/obj.o", "out.old.1.0/obj.o", ".git/HEAD"]:
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text("")
+    advised = []
+    real_open = os.open
+
+    def recording_open(path, flags, *args):
+        advised.append(path)
+        return real_open(path, flags, *args)
+
+    monkeypatch.setattr(br.os, "open", recording_open)
+    tr = br.TestRunner()
+    # the configured build dir is skipped whatever its name; buildtools/ is a source dir
+    tr.builder = {"build_path": tmp_path / "out", "execute_path": tmp_path, "command": "", "compiler_flags": []}
+    tr._prefetch_sources()
+    assert sorted(advised) == [str(tmp_path / "CMakeLists.txt"), str(tmp_path / "buildtools" / "gen.py"),
+                               str(tmp_path / "src" / "a.cpp")]
+
+
+def test_gcc_builder_skips_configure_when_up_to_date(tmp_path, fake_test_runner):
+    calls = []
+
+    def fake_run(cmd, cwd=None, capture_output=False):
+        step = "build" if "--build" in cmd else "configure"
+        calls.append(step)
+        if step == "configure":
+            (tmp_path / "build" / "CMakeCache.txt").write_text("")
+        return fake_test_runner.Result()
+
+    (tmp_path / "CMakeLists.txt").write_text("")
+    tr = fake_test_runner(use_ccache=False)
+    tr._run_impl = fake_run
+    tr.builder = {"build_path": tmp_path / "build", "execute_path": tmp_path, "command": "", "compiler_flags": []}
+    tr.use_gcc_builder = True
+
+    tr.make_build()
+    assert calls == ["configure", "build"]
+    (tmp_path / "build" / "obj.o").write_text("")
+
+    # unchanged configure command: incremental build only
+    calls.clear()
+    tr.make_build()
+    assert calls == ["build"]
+    assert (tmp_path / "build" / "obj.o").exists()
+
+    # changed flags: build tree is wiped and reconfigured
+    calls.clear()
+    tr.builder["compiler_flags"] = ["-DFAIL_TEST=ON"]
+    tr.make_build()
+    assert calls == ["configure", "build"]
+    assert not (tmp_path / "build" / "obj.o").exists()
+
+    # explicit clean always reconfigures
+    calls.clear()
+    tr.make_build(clean=True)
+    assert calls == ["configure", "build"]
+
+
+def test_make_testrun_always_builds(tmp_path, fake_test_runner):
+    calls = []
+
+    def fake_run(cmd, cwd=None, capture_output=False):
+        step = "build" if "--build" in cmd else "configure"
+        calls.append(step)
+        if step == "configure":
+            (tmp_path / "build" / "CMakeCache.txt").write_text("")
+        return fake_test_runner.Result()
+
+    (tmp_path / "CMakeLists.txt").write_text("")
+    os.utime(tmp_path / "CMakeLists.txt", (0, 0))
+    tr = fake_test_runner(use_ccache=False)
+    tr._run_impl = fake_run
+    tr.builder = {"build_path": tmp_path / "build", "execute_path": tmp_path, "command": "", "compiler_flags": []}
+    tr.runner = {"execute_path": tmp_path / "build", "build_path": tmp_path / "build"}
+    tr.use_gcc_builder = True
+    tr._ctest_version = (3, 28)
 
-        return R()
-
-    # Always patch the TestRunner.run method for class-based API
-    if hasattr(br, "TestRunner"):
-        def fake_method(self, cmd, cwd=None, capture_output=False, env=None, **kwargs):
-            return fake_run(cmd, cwd=cwd, env=env, capture_output=capture_output)
-
-        monkeypatch.setattr(br.TestRunner, "run", fake_method, raising=False)
-    elif hasattr(br, "run"):
-        monkeypatch.setattr(br, "run", fake_run)
-    if hasattr(br, "run_build"):
-        unit = br.run_build(project, env={}, cores=1)
-        assert (project / "build" / "unitTest").exists()
-        assert unit.exists()
-    elif hasattr(br, "TestRunner"):
-        tr = br.TestRunner()
-        tr.repo_root = project
-        tr.builder = {"build_path": project / "build", "execute_path": project, "command": ""}
-        tr.make_build()
-        assert (project / "build").exists()
-
-    # simulate failure: raise CalledProcessError
-    def fail_run(cmd, cwd=None, env=None, capture_output=False):
-        raise subprocess.CalledProcessError(1, cmd)
-
-    if hasattr(br, "TestRunner"):
-        def fail_method(self, cmd, cwd=None, capture_output=False, env=None, **kwargs):
-            class R:
-                def __init__(self):
-                    self.returncode = 1
-                    self.stdout = ""
-                    self.stderr = "failed"
-
-            return R()
-
-        monkeypatch.setattr(br.TestRunner, "run", fail_method, raising=False)
-        # invoking make_build should handle the error (no uncaught exception)
-        tr2 = br.TestRunner()
-        tr2.builder = {"build_path": project / "build", "execute_path": project, "command": ""}
-        tr2.use_gcc_builder = True
-        tr2.make_build()
-    elif hasattr(br, "run"):
-        monkeypatch.setattr(br, "run", fail_run)
-        with pytest.raises(SystemExit):
-            br.run_build(project, env={}, cores=1)
-
-
-def test_run_tests_success_and_failure(tmp_path, monkeypatch):
-    unit_dir = tmp_path / "build" / "unitTest"
-    unit_dir.mkdir(parents=True)
-
-    class R:
-        def __init__(self, code, out=""):
-            self.returncode = code
-            self.stdout = out
-
-    def ok_run(cmd, cwd=None, env=None, capture_output=False, **kwargs):
-        return R(0, "")
+    tr.make_testrun()
+    assert calls == ["configure", "build"]
 
-    def fake_ok(self, cmd, cwd=None, capture_output=False, env=None, **kwargs):
-        return ok_run(cmd, cwd=cwd, env=env, capture_output=capture_output)
+    # a configured tree skips configure, but the build tool still decides
+    # what is stale (deleted sources, headers outside the tree)
+    calls.clear()
+    tr.make_testrun()
+    assert calls == ["build"]
 
-    if hasattr(br, "TestRunner"):
-        monkeypatch.setattr(br.TestRunner, "run", fake_ok, raising=False)
-        tr = br.TestRunner()
-        tr.runner = {"execute_path": unit_dir, "build_path": unit_dir}
-        ret_code, out = tr.run_ctest_tests()
-        assert ret_code == 0
 
-        def bad_run(cmd, cwd=None, env=None, capture_output=False, **kwargs):
-            return R(1, sample_ctest_output())
+def test_make_testrun_reports_failed_tests(tmp_path, monkeypatch, captured, fake_test_runner):
+    monkeypatch.setattr(br.TestRunner, "make_build", lambda self, clean=False: None)
+    tr = fake_test_runner()
+    tr.streams(SAMPLE_CTEST_OUTPUT, 8)
+    tr.use_gcc_builder = True
+    tr.runner = {"execute_path": tmp_path, "build_path": tmp_path}
+    with captured() as out:
+        tr.make_testrun()
+    assert tr.has_failed()
+    log_path = tmp_path / "Testing" / "Temporary" / "LastTest.log"
+    assert out.getvalue().endswith(
+        f"FAIL: tests failed\nFailed tests:\n- test_one\n- test_two\nLogs: {log_path}\n"
+    )
 
-        def fake_bad(self, cmd, cwd=None, capture_output=False, env=None, **kwargs):
-            return bad_run(cmd, cwd=cwd, env=env, capture_output=capture_output)
 
-        monkeypatch.setattr(br.TestRunner, "run", fake_bad, raising=False)
-        tr2 = br.TestRunner()
-        tr2.runner = {"execute_path": unit_dir, "build_path": unit_dir}
-        ret_code2, out2 = tr2.run_ctest_tests()
-        assert ret_code2 != 0
-    else:
-        monkeypatch.setattr(br, "run", ok_run)
-        if hasattr(br, "run_tests"):
-            br.run_tests(tmp_path, unit_dir, env={})
-        monkeypatch.setattr(br, "run", lambda cmd, cwd=None, env=None, capture_output=False: R(1, sample_ctest_output()))
-        if hasattr(br, "run_tests"):
-            with pytest.raises(SystemExit):
-                br.run_tests(tmp_path, unit_dir, env={})
-import importlib.util
+def test_run_ctest_tests_runs_in_parallel(tmp_path, fake_test_runner):
+    tr = fake_test_runner()
+    tr.runner = {"execute_path": tmp_path, "build_path": tmp_path}
+    tr.test_jobs = 3
+    tr.run_ctest_tests()
+    assert "-j3" in tr.calls[-1]
+    assert tr.env["CTEST_PARALLEL_LEVEL"] == "3"
+
+
+@pytest.mark.parametrize("version, junit", [("3.16.3", False), ("3.21.0", True), ("", False)])
+def test_junit_report_needs_ctest_3_21(tmp_path, fake_test_runner, version, junit):
+    tr = fake_test_runner()
+    tr.returns(tr.Result(stdout=f"ctest version {version}\n" if version else "", returncode=0))
+    tr.runner = {"execute_path": tmp_path, "build_path": tmp_path}
+    tr.run_ctest_tests()
+    tr.run_ctest_tests()
+    # the version is probed once per runner
+    assert tr.calls.count(["ctest", "--version"]) == 1
+    assert ("--output-junit" in tr.calls[-1]) == junit
+    assert tr.junit_reports == ([tr.junit_report_path()] if junit else [])
+    if not junit:
+        # failures then come from the streamed ctest output
+        assert tr.collect_junit_failures() is None
+
+
+def test_parse_junit_failures(tmp_path):
+    tr = br.TestRunner()
+    report = tmp_path / "junit.xml"
+    assert tr.parse_junit_failures(report) is None
+    report.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<testsuite tests="3" failures="2">\n'
+        '  <testcase name="Suite.Ok" status="run"><system-out>ok</system-out></testcase>\n'
+        '  <testcase name="Suite.Bad" status="fail"><failure message=""/></testcase>\n'
+        '  <testcase name="Suite.Worse" status="fail"><failure message=""/></testcase>\n'
+        '</testsuite>\n'
+    )
+    assert tr.parse_junit_failures(report) == ["Suite.Bad", "Suite.Worse"]
+    report.write_text("<testsuite>")
+    assert tr.parse_junit_failures(report) is None
+
+
+def test_shard_tests_balances_on_cost(tmp_path, fake_test_runner):
+    temporary = tmp_path / "Testing" / "Temporary"
+    temporary.mkdir(parents=True)
+    (temporary / "CTestCostData.txt").write_text("A 1 10\nB 1 6\nC 1 5\nD 1 1\n---\nB\n")
+    tr = fake_test_runner()
+    tr.returns(tr.Result(stdout=json.dumps({"tests": [{"name": n} for n in ["A", "B", "C", "D"]]})))
+    tr.runner = {"execute_path": tmp_path, "build_path": tmp_path}
+    assert tr.shard_tests(2) == [[1, 4], [2, 3]]
+    assert tr.shard_tests(8) == [[1], [2], [3], [4]]
+
+    tr.calls.clear()
+    tr.test_jobs = 2
+    tr._ctest_version = (3, 28)
+    returncode, _ = tr.run_sharded_ctest_tests()
+    assert returncode == 0
+    shard_cmds = sorted(c for c in tr.calls if "-I" in c)
+    assert [c[c.index("-I") + 1] for c in shard_cmds] == ["0,0,0,1,4", "0,0,0,2,3"]
+    assert [p.name for p in tr.junit_reports] == ["junit-0.xml", "junit-1.xml"]
+    # each shard runs from its own directory, so logs and cost data don't collide
+    for i in range(2):
+        shard_dir = tmp_path / "Testing" / f"shard-{i}"
+        assert (shard_dir / "CTestTestfile.cmake").read_text() == f'subdirs("{tmp_path.resolve().as_posix()}")\n'
+        assert tr.test_logs[i] == shard_dir / "Testing" / "Temporary" / "LastTest.log"
+
+
+def test_merge_test_costs(tmp_path, fake_test_runner):
+    temporary = tmp_path / "Testing" / "Temporary"
+    temporary.mkdir(parents=True)
+    (temporary / "CTestCostData.txt").write_text("A 1 10\nB 1 6\nC 1 5\n---\nB\n")
+    shard_dirs = [tmp_path / "Testing" / f"shard-{i}" for i in range(2)]
+    for shard_dir, data in zip(shard_dirs, ["A 1 8\nC 0 0\n---\nC\n", "B 1 2\nD 1 3\n---\n"]):
+        (shard_dir / "Testing" / "Temporary").mkdir(parents=True)
+        (shard_dir / "Testing" / "Temporary" / "CTestCostData.txt").write_text(data)
+    tr = fake_test_runner()
+    tr.runner = {"execute_path": tmp_path, "build_path": tmp_path}
+    tr.merge_test_costs(shard_dirs)
+    # a test failing in its shard (0 runs) keeps its previous cost
+    assert (temporary / "CTestCostData.txt").read_text() == "A 1 8\nB 1 2\nC 1 5\nD 1 3\n---\nC\n"
+    assert tr.read_test_costs() == {"A": 8.0, "B": 2.0, "C": 5.0, "D": 3.0}
+
+
+def test_run_tests_success_and_failure(tmp_path, fake_test_runner):
+    unit_dir = tmp_path / "build" / "unitTest"
+    os.makedirs(unit_dir, exist_ok=True)
+
+    # the fake runner's ctest passes by default
+    tr = fake_test_runner()
+    tr.runner = {"execute_path": unit_dir, "build_path": unit_dir}
+    ret_code, out = tr.run_ctest_tests()
+    assert ret_code == 0
+    assert out == []
+
+    tr2 = fake_test_runner()
+    tr2.streams(SAMPLE_CTEST_OUTPUT, 1)
+    tr2.runner = {"execute_path": unit_dir, "build_path": unit_dir}
+    ret_code2, out2 = tr2.run_ctest_tests()
+    assert ret_code2 != 0
+    assert out2 == ["test_one", "test_two"]
 import json
 import os
-import pathlib
 import shutil
 import subprocess
 import sys
@@ -283,46 +464,8 @@ import sys
 import pytest
 
 
-def _load_module():
-    root = pathlib.Path(__file__).resolve().parents[2]
-    mod_path = root / "agent" / "build_and_run_tests.py"
-    spec = importlib.util.spec_from_file_location("build_and_run_tests", str(mod_path))
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    return mod
-
-
-def test_load_rules_and_get_execute_path(tmp_path):
-    mod = _load_module()
-    data = {
-        "project_configurations": [
-            {
-                "project_type": "myproj",
-                "testframework": {"test_builder": {"execute_path": "path/to/proj", "command": "make"}},
-            }
-        ]
-    }
-    rules_file = tmp_path / "rules.json"
-    rules_file.write_text(json.dumps(data))
-
-    if hasattr(mod, "RulesParser"):
-        rp = mod.RulesParser(rules_file)
-        tb = rp.get_test_builder("myproj")
-        assert tb["execute_path"] == "path/to/proj"
-        assert tb["command"] == "make"
-        assert rp.get_test_builder("other") is None
-    else:
-        # fall back to the standalone RulesParser implementation
-        import agent.rules_parser as rpmod
-        rp = rpmod.RulesParser(rules_file)
-        tb = rp.get_test_builder("myproj")
-        assert tb["execute_path"] == "path/to/proj"
-        assert tb["command"] == "make"
-        assert rp.get_test_builder("other") is None
-
-
 def test_find_repo_root(tmp_path):
-    mod = _load_module()
+    mod = br
     root = tmp_path / "root"
     nested = root / "a" / "b" / "c"
     nested.mkdir(parents=True)
@@ -332,7 +475,7 @@ def test_find_repo_root(tmp_path):
 
 
 def test_parse_ctest_failures_and_no_failures():
-    mod = _load_module()
+    mod = br
     sample = """Start
 The following tests FAILED:
   1 - FooTest (Failed)
@@ -349,17 +492,15 @@ The following tests FAILED:
         tr = mod.TestRunner()
         assert tr.parse_ctest_failures(sample) == ["FooTest", "BarTest"]
         assert tr.parse_ctest_failures("All tests passed\n") == []
+        assert tr.parse_ctest_failures(sample.encode()) == ["FooTest", "BarTest"]
     else:
         pytest.skip("No ctest parser available")
 
 
-def test_clean_build_dirs(tmp_path):
-    mod = _load_module()
-    proj = tmp_path / "proj"
-    proj.mkdir()
+def test_clean_build_dirs(mkdirs):
+    mod = br
     # create an existing build dir with a file
-    b = proj / "build"
-    b.mkdir()
+    proj, b = mkdirs("proj", "proj/build")
     (b / "old.txt").write_text("old")
     if hasattr(mod, "clean_build_dirs"):
         unit_dir, integration_dir = mod.clean_build_dirs(proj)
@@ -372,12 +513,42 @@ def test_clean_build_dirs(tmp_path):
         assert build_dir.exists()
         # Not all class implementations return unit/integration dirs
         assert not (b / "old.txt").exists()
+        # the moved-aside tree is deleted in the background
+        if hasattr(mod, "_join_cleanup_threads"):
+            mod._join_cleanup_threads()
+            assert sorted(p.name for p in proj.iterdir()) == ["build"]
     else:
         pytest.skip("No clean_build_dirs available")
 
 
+def test_clean_build_dirs_moves_old_tree_out_of_work_tree(tmp_path):
+    (tmp_path / ".git").mkdir()
+    build_dir = tmp_path / "build"
+    build_dir.mkdir()
+    (build_dir / "old.txt").write_text("old")
+    # a tree left behind by an earlier run that exited mid-delete
+    leftover = tmp_path / ".git" / br.OLD_BUILDS_DIR / "build.old.1.0"
+    leftover.mkdir(parents=True)
+    tr = br.TestRunner()
+    tr.repo_root = tmp_path.resolve()
+    tr.clean_build_dirs(build_dir)
+    # nothing next to the build dir for git status to report as untracked
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".git", "build"]
+    assert list(build_dir.iterdir()) == []
+    br._join_cleanup_threads()
+    assert not (tmp_path / ".git" / br.OLD_BUILDS_DIR).exists()
+
+    # without a .git directory to move it into, the tree is deleted in place
+    (tmp_path / ".git").rmdir()
+    (tmp_path / ".git").write_text("gitdir: /elsewhere\n")
+    (build_dir / "new.txt").write_text("new")
+    tr.clean_build_dirs(build_dir)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".git", "build"]
+    assert list(build_dir.iterdir()) == []
+
+
 def test_build_env_removes_keys_and_sets_compilers(monkeypatch):
-    mod = _load_module()
+    mod = br
     fake_env = os.environ.copy()
     # add some OECORE variables
     fake_env["OECORE_TARGET_OS"] = "linux"
@@ -389,18 +560,10 @@ def test_build_env_removes_keys_and_sets_compilers(monkeypatch):
     assert env.get("CC") == "/usr/bin/gcc"
 
 
-def test_run_capture_output_invokes_subprocess(monkeypatch):
-    mod = _load_module()
+def test_run_capture_output_invokes_subprocess(fake_subprocess):
+    mod = br
 
-    class Dummy:
-        def __init__(self):
-            self.returncode = 0
-            self.stdout = "ok"
-
-    def fake_run(*args, **kwargs):
-        return Dummy()
-
-    monkeypatch.setattr(subprocess, "run", fake_run)
+    fake_subprocess.set("echo", fake_subprocess.result(b"ok", stderr=b"\xff"))
     if hasattr(mod, "run"):
         res = mod.run(["echo", "hi"], cwd=".", capture_output=True)
         assert res is not None
@@ -410,59 +573,50 @@ def test_run_capture_output_invokes_subprocess(monkeypatch):
         res = tr.run(["echo", "hi"], cwd=".", capture_output=True)
         assert res is not None
         assert res.stdout == "ok"
+        assert res.stderr == "\ufffd"
     else:
         pytest.skip("No run function available")
 
 
-def test_main_build_and_test_success(tmp_path, monkeypatch, capsys):
-    mod = _load_module()
+def test_run_streaming_echoes_and_forwards_lines(captured):
+    mod = br
+    tr = mod.TestRunner()
+    seen = []
+    with captured() as out:
+        code = tr.run_streaming([sys.executable, "-c", "print('a'); print('b'); raise SystemExit(3)"], on_line=seen.append)
+    assert code == 3
+    assert seen == ["a\n", "b\n"]
+    assert "a\nb\n" in out.getvalue()
+
+
+@pytest.fixture
+def main_flow(request, tmp_path, rules_dir, monkeypatch, fake_test_runner):
+    """A runner configured from the dti_tools rules whose commands all
+    succeed ("ok") or whose build and ctest both fail ("fail")."""
+    mod = br
     # prepare rules and project dir
     repo_root = tmp_path / "repo"
     proj = repo_root / "proj"
     proj.mkdir(parents=True)
-    rules = {"project_configurations": [{"project_type": "dti_tools", "testframework": {"test_builder": {"execute_path": "proj", "command": "make", "gcc_builder": True}, "test_runner": {"execute_path": "proj", "command": "ctest"}}}]}
-    rules_file = tmp_path / "rules.json"
-    rules_file.write_text(json.dumps(rules))
-
-    # monkeypatch repo discovery to return our tmp repo
-    if hasattr(mod, "git_repo_root"):
-        monkeypatch.setattr(mod, "git_repo_root", lambda start: repo_root)
-    elif hasattr(mod, "TestRunner"):
-        # TestRunner uses module git_repo_root during init; patch module function
-        monkeypatch.setattr(mod, "git_repo_root", lambda start: repo_root)
-    else:
-        pytest.skip("No repo-root discovery API available")
-
-    # fake run: for build steps return None, for ctest capture_output return success
-    class Result:
-        def __init__(self, returncode=0, stdout=""):
-            self.returncode = returncode
-            self.stdout = stdout
-
-    def fake_run(cmd, cwd=None, env=None, capture_output=False, text=None):
-        if capture_output:
-            return Result(returncode=0, stdout="All tests passed\n")
-        return None
-
-    if hasattr(mod, "run"):
-        monkeypatch.setattr(mod, "run", fake_run)
-    elif hasattr(mod, "TestRunner"):
-        monkeypatch.setattr(mod.TestRunner, "run", lambda self, cmd, cwd=None, env=None, capture_output=False: fake_run(cmd, cwd=cwd, env=env, capture_output=capture_output))
-    else:
-        pytest.skip("No run function available")
+    rules_file = rules_dir / "rules.json"
 
+    # patch module git_repo_root (class uses it during init)
+    monkeypatch.setattr(mod, "git_repo_root", lambda start: repo_root)
     monkeypatch.setenv("PYTHONWARNINGS", "ignore")
 
-    # construct TestRunner and drive build/test flow using RulesParser
-    if hasattr(mod, "RulesParser"):
-        rp = mod.RulesParser(rules_file)
-    else:
-        import agent.rules_parser as rpmod
-        rp = rpmod.RulesParser(rules_file)
+    import rules_parser as rpmod
+    rp = rpmod.RulesParser(rules_file)
     runner_cfg = rp.get_test_runner("dti_tools")
     builder_cfg = rp.get_test_builder("dti_tools") or {}
 
-    tr = mod.TestRunner()
+    tr = fake_test_runner()
+    if request.param == "ok":
+        # every captured command, builds and ctest alike, succeeds
+        tr.returns(tr.Result(stdout="All tests passed\n"))
+    else:
+        bad = tr.Result(1, "The following tests FAILED:\n  1 - BadTest (Failed)\n", "ctest failed")
+        tr.returns(bad)
+        tr.streams(bad.stdout, 1)
     tr.make_framework_entry(
         False,
         runner_cfg.get("command", ""),
@@ -477,66 +631,22 @@ def test_main_build_and_test_success(tmp_path, monkeypatch, capsys):
         builder_cfg.get("compiler_flags", []),
     )
     tr.use_gcc_builder = builder_cfg.get("gcc_builder", False)
-    # perform testrun which will print success
-    tr.make_testrun()
-    # assert success printed
-    # (make_testrun prints OK: tests success when run succeeds)
-
-
-def test_main_test_failure_reports(tmp_path, monkeypatch):
-    mod = _load_module()
-    repo_root = tmp_path / "repo"
-    proj = repo_root / "proj"
-    proj.mkdir(parents=True)
-    rules = {"project_configurations": [{"project_type": "dti_tools", "testframework": {"test_builder": {"execute_path": "proj", "command": "make", "gcc_builder": True}, "test_runner": {"execute_path": "proj", "command": "ctest"}}}]}
-    rules_file = tmp_path / "rules.json"
-    rules_file.write_text(json.dumps(rules))
+    return tr
 
-    # patch module git_repo_root (class uses it during init)
-    monkeypatch.setattr(mod, "git_repo_root", lambda start: repo_root)
 
-    class BadResult:
-        def __init__(self):
-            self.returncode = 1
-            self.stdout = "The following tests FAILED:\n  1 - BadTest (Failed)\n"
-            self.stderr = "ctest failed"
-
-    def fake_run_fail(cmd, cwd=None, env=None, capture_output=False, text=None):
-        if capture_output:
-            return BadResult()
-        return None
-
-    # patch the TestRunner instance method `run` instead of a module-level run
-    def fake_run_fail_method(self, cmd, cwd=None, env=None, capture_output=False, text=None):
-        if capture_output:
-            return BadResult()
-        return None
-
-    monkeypatch.setattr(mod.TestRunner, "run", fake_run_fail_method, raising=False)
-    if hasattr(mod, "RulesParser"):
-        rp = mod.RulesParser(rules_file)
-    else:
-        import agent.rules_parser as rpmod
-        rp = rpmod.RulesParser(rules_file)
-    runner_cfg = rp.get_test_runner("dti_tools")
-    builder_cfg = rp.get_test_builder("dti_tools") or {}
+@pytest.mark.parametrize("main_flow, expected_failed", [("ok", False), ("fail", True)], indirect=["main_flow"])
+def test_main_build_and_testrun(main_flow, expected_failed):
+    # run testrun, which marks failures internally
+    main_flow.make_testrun()
+    assert main_flow.has_failed() is expected_failed
 
-    tr = mod.TestRunner()
-    tr.make_framework_entry(
-        False,
-        runner_cfg.get("command", ""),
-        runner_cfg.get("execute_path", ""),
-        runner_cfg.get("build_path", runner_cfg.get("execute_path", "")),
-    )
-    tr.make_framework_entry(
-        True,
-        builder_cfg.get("command", ""),
-        builder_cfg.get("execute_path", ""),
-        builder_cfg.get("build_path", builder_cfg.get("execute_path", "")),
-        builder_cfg.get("compiler_flags", []),
-    )
-    tr.use_gcc_builder = builder_cfg.get("gcc_builder", False)
 
-    # run testrun, which should mark failures internally
-    tr.make_testrun()
-    assert tr.has_failed()
+def test_resolve_command_uses_path_of_runner_env(tmp_path):
+    tool = tmp_path / "mytool"
+    tool.write_text("#!/bin/sh\n")
+    tool.chmod(0o755)
+    tr = br.TestRunner()
+    tr.env = {"PATH": str(tmp_path)}
+    assert tr.resolve_command(["mytool", "-v"]) == [str(tool), "-v"]
+    assert tr.resolve_command(["no-such-tool-xyz"]) == ["no-such-tool-xyz"]
+    assert tr.resolve_command(["./mytool"]) == ["./mytool"]
@@ -1,61 +1,43 @@
+import json
+import shutil
 import subprocess
-import agent.git_file_handler as gfh
+import types
+import git_file_handler as gfh
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def _clear_git_cache():
+    gfh.clear_cache()
+    yield
+    gfh.clear_cache()
+
+
 def test_normalize_token_untracked():
     assert gfh._normalize_filename_from_token("?? foo.txt") == ("??", "foo.txt")
 
 
 def test_normalize_token_added_and_rename():
     assert gfh._normalize_filename_from_token("A  new.txt") == ("A ", "new.txt")
-    assert gfh._normalize_filename_from_token("R  old -> new.txt") == ("R ", "new.txt")
+    assert gfh._normalize_filename_from_token("R  new.txt") == ("R ", "new.txt")
 
 
 def test_normalize_token_fallback():
-    assert gfh._normalize_filename_from_token("weird") == ("", "weird")
-
-
-def test_run_git_status_porcelain_success(monkeypatch):
-    class Proc:
-        stdout = "?? a\nA  b\n"
+    assert gfh._normalize_filename_from_token("weird") is None
 
-    def fake_run(cmd, check, capture_output, text):
-        return Proc()
 
-    monkeypatch.setattr(gfh.subprocess, "run", fake_run)
+def test_run_git_status_porcelain_success(fake_subprocess):
+    fake_subprocess.set("status", fake_subprocess.result(b"?? a\x00A  b\x00R  new name\x00old name\x00 M c\x00?? bad\xff\x00"))
     res = gfh._run_git_status_porcelain("/tmp")
-    assert res == ["?? a", "A  b"]
+    assert "-z" in fake_subprocess.calls[0]
+    assert res == ["?? a", "A  b", "R  new name", " M c", "?? bad\udcff"]
 
 
-def test_run_git_status_porcelain_failure(monkeypatch):
-    def fake_run(cmd, check, capture_output, text):
-        raise subprocess.CalledProcessError(1, cmd)
-
-    monkeypatch.setattr(gfh.subprocess, "run", fake_run)
+def test_run_git_status_porcelain_failure(fake_subprocess):
+    fake_subprocess.set("status", subprocess.CalledProcessError(1, ["git", "status"]))
     assert gfh._run_git_status_porcelain("/tmp") == []
 
 
-def test_run_git_ls_files(monkeypatch):
-    class Proc:
-        stdout = "./x.txt\ny.txt\n"
-
-    def fake_run(cmd, check, capture_output, text):
-        return Proc()
-
-    monkeypatch.setattr(gfh.subprocess, "run", fake_run)
-    res = gfh._run_git_ls_files("/tmp")
-    assert res == ["./x.txt", "y.txt"]
-
-
-def test_run_git_ls_files_failure(monkeypatch):
-    def fake_run(cmd, check, capture_output, text):
-        raise subprocess.CalledProcessError(1, cmd)
-
-    monkeypatch.setattr(gfh.subprocess, "run", fake_run)
-    assert gfh._run_git_ls_files("/tmp") == []
-
-
 def test_get_changed_files(monkeypatch):
     monkeypatch.setattr(
         gfh,
@@ -65,20 +47,135 @@ def test_get_changed_files(monkeypatch):
             "A  added.txt",
             " M mod_unstaged.txt",
             "D  deleted.txt",
-            "R  old -> renamed.txt",
+            "R  renamed.txt",
         ],
     )
 
-    monkeypatch.setattr(gfh, "_run_git_ls_files", lambda path: ["./from_ls.txt", "file2.txt"])
-
     res = gfh.get_changed_files("/tmp")
 
-    assert set(res["created"]) == set(["untracked.txt", "added.txt", "from_ls.txt", "file2.txt"])
+    assert set(res["created"]) == set(["untracked.txt", "added.txt"])
     assert res["added"] == ["added.txt"]
     assert res["modified"] == ["mod_unstaged.txt"]
     assert res["deleted"] == ["deleted.txt"]
 
 
+def _git(cwd, *args):
+    subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """A real repository with one commit holding `top` and `sub/tracked`."""
+    if shutil.which("git") is None:
+        pytest.skip("git is not installed")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "top").write_text("top\n")
+    (tmp_path / "sub" / "tracked").write_text("tracked\n")
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "commit", "-q", "-m", "init")
+    return tmp_path
+
+
+def test_get_changed_files_from_subdir_sees_whole_repo(git_repo, monkeypatch):
+    monkeypatch.setattr(gfh, "pygit2", None)
+    (git_repo / "untracked_top").write_text("new\n")
+    # nothing changed below sub/, yet files elsewhere in the repo count
+    res = gfh.get_changed_files(str(git_repo / "sub"))
+    # a plain dict, so callers can copy or serialize it
+    assert json.loads(json.dumps(res)) == {"created": ["untracked_top"], "added": [], "modified": [], "deleted": []}
+
+
+def _fake_pygit2(statuses):
+    """A pygit2 stand-in whose repository at /repo reports `statuses`,
+    a map of file -> names of GIT_STATUS_* flags."""
+    class FakeRepo:
+        workdir = "/repo/"
+
+        def __init__(self, git_dir):
+            assert git_dir == "/repo/.git/"
+
+        def status(self):
+            return {name: sum(getattr(fake, flag) for flag in flags) for name, flags in statuses.items()}
+
+    fake = types.SimpleNamespace(
+        GIT_STATUS_INDEX_NEW=1,
+        GIT_STATUS_INDEX_MODIFIED=2,
+        GIT_STATUS_INDEX_DELETED=4,
+        GIT_STATUS_WT_NEW=128,
+        GIT_STATUS_WT_MODIFIED=256,
+        GIT_STATUS_WT_DELETED=512,
+        GIT_STATUS_IGNORED=16384,
+        discover_repository=lambda path: "/repo/.git/",
+        Repository=FakeRepo,
+    )
+    return fake
+
+
+def test_get_changed_files_uses_pygit2_when_available(monkeypatch, fake_subprocess):
+    monkeypatch.setattr(gfh, "pygit2", _fake_pygit2({
+        "new.txt": ["GIT_STATUS_WT_NEW"],
+        "staged.txt": ["GIT_STATUS_INDEX_NEW", "GIT_STATUS_WT_MODIFIED"],
+        "gone.txt": ["GIT_STATUS_WT_DELETED"],
+        "ignored.o": ["GIT_STATUS_IGNORED"],
+    }))
+
+    res = gfh.get_changed_files("/repo/sub")
+    assert fake_subprocess.calls == []
+    assert res == {
+        "created": ["new.txt", "staged.txt"],
+        "added": ["staged.txt"],
+        "modified": ["staged.txt"],
+        "deleted": ["gone.txt"],
+    }
+
+
+def test_staged_rename_reported_alike_by_both_backends(git_repo, monkeypatch):
+    _git(git_repo, "mv", "top", "renamed_top")
+    expected = {"created": ["renamed_top"], "added": ["renamed_top"], "modified": [], "deleted": ["top"]}
+    monkeypatch.setattr(gfh, "pygit2", None)
+    assert gfh.get_changed_files(str(git_repo)) == expected
+
+    # libgit2's answer for the same rename
+    monkeypatch.setattr(gfh, "pygit2", _fake_pygit2({
+        "top": ["GIT_STATUS_INDEX_DELETED"],
+        "renamed_top": ["GIT_STATUS_INDEX_NEW"],
+    }))
+    assert gfh.get_changed_files("/repo") == expected
+
+    pygit2 = pytest.importorskip("pygit2")
+    monkeypatch.setattr(gfh, "pygit2", pygit2)
+    assert gfh.get_changed_files(str(git_repo)) == expected
+
+
+def test_accessors_share_result_within_snapshot(monkeypatch, tmp_path):
+    repo = tmp_path / "repo"
+    (repo / ".git").mkdir(parents=True)
+    (repo / "sub").mkdir()
+    calls = []
+
+    def fake_changed(path):
+        calls.append(path)
+        return {"created": ["c"], "added": ["a"], "modified": ["m"], "deleted": []}
+
+    monkeypatch.setattr(gfh, "get_changed_files", fake_changed)
+    # outside a snapshot every query sees the current work tree
+    gfh.get_created_files(str(repo))
+    gfh.get_created_files(str(repo))
+    assert len(calls) == 2
+
+    calls.clear()
+    with gfh.status_snapshot():
+        assert gfh.get_created_files(str(repo)) == ["c"]
+        with gfh.status_snapshot():
+            assert gfh.get_added_files(str(repo / "sub")) == ["a"]
+        assert gfh.get_modified_files(str(repo)) == ["m"]
+    assert len(calls) == 1
+
+    gfh.get_modified_files(str(repo))
+    assert len(calls) == 2
+
+
 def test_wrappers(monkeypatch):
     monkeypatch.setattr(gfh, "get_changed_files", lambda path: {"created": [1], "added": [2], "modified": [3]})
     assert gfh.get_created_files("p") == [1]
@@ -87,7 +184,7 @@ def test_wrappers(monkeypatch):
 import subprocess
 import types
 
-import agent.git_file_handler as gfh
+import git_file_handler as gfh
 
 
 def test_normalize_untracked():
@@ -107,51 +204,34 @@ def test_normalize_xy_and_rename():
     assert status == " M"
     assert name == "modified.txt"
 
-    # rename: should return destination filename
-    status, name = gfh._normalize_filename_from_token("R  oldname -> newname.txt")
+    # rename: the record carries the destination filename
+    status, name = gfh._normalize_filename_from_token("R  newname.txt")
     assert status == "R "
     assert name == "newname.txt"
 
 
 def test_normalize_fallback():
-    status, name = gfh._normalize_filename_from_token("weirdformat")
-    assert status == ""
-    assert name == "weirdformat"
+    assert gfh._normalize_filename_from_token("weirdformat") is None
 
 
-def test_get_changed_files_monkeypatched(monkeypatch):
+def test_get_changed_files_monkeypatched(fake_subprocess):
     # Prepare fake outputs for git status and git ls-files
-    status_output = """
-?? untracked.txt
-A  staged_add.txt
- M modified_unstaged.txt
-D  deleted.txt
-R  old.txt -> renamed.txt
-"""
-
-    ls_files_output = "./extra.txt\nsub/another.txt\n"
-
-    def fake_run(cmd, check, capture_output, text):
-        class P:
-            def __init__(self, out):
-                self.stdout = out
-
-        # detect which git command is being called
-        if "status" in cmd:
-            return P(status_output)
-        if "ls-files" in cmd:
-            return P(ls_files_output)
-        raise subprocess.CalledProcessError(1, cmd)
-
-    monkeypatch.setattr(subprocess, "run", fake_run)
+    status_output = (
+        b"?? untracked.txt\x00"
+        b"A  staged_add.txt\x00"
+        b" M modified_unstaged.txt\x00"
+        b"D  deleted.txt\x00"
+        b"R  renamed.txt\x00old.txt\x00"
+        b"x\x00"
+    )
+
+    # only git status is expected
+    fake_subprocess.set("status", fake_subprocess.result(status_output))
 
     res = gfh.get_changed_files(".")
 
-    # created should include untracked, staged add, and ls-files entries
-    assert "untracked.txt" in res["created"]
-    assert "staged_add.txt" in res["created"]
-    assert "extra.txt" in res["created"]
-    assert "sub/another.txt" in res["created"]
+    # created should include untracked files and staged adds
+    assert res["created"] == ["staged_add.txt", "untracked.txt"]
 
     # added should contain staged_add.txt
     assert res["added"] == ["staged_add.txt"]
@@ -161,3 +241,6 @@ R  old.txt -> renamed.txt
 
     # deleted should contain deleted.txt
     assert res["deleted"] == ["deleted.txt"]
+
+    # a malformed record never shows up as a file
+    assert all("x" not in res[kind] for kind in res)
@@ -3,7 +3,12 @@ from pathlib import Path
 
 import pytest
 
-from agent.rules_parser import RulesParser
+from rules_parser import RulesParser
+
+
+# rules serialized once; the second differs in size so a rewrite is seen
+_RULES_X1_JSON = json.dumps({"project_configurations": [{"project_type": "a", "file_rules": {"x": 1}}]}).encode("utf-8")
+_RULES_X22_JSON = json.dumps({"project_configurations": [{"project_type": "a", "file_rules": {"x": 22}}]}).encode("utf-8")
 
 
 def test_init_missing_file(tmp_path):
@@ -12,40 +17,17 @@ def test_init_missing_file(tmp_path):
         RulesParser(missing)
 
 
-def test_get_test_runner_and_builder_with_path_and_string(tmp_path):
-    data = {
-        "project_configurations": [
-            {
-                "project_type": "myproj",
-                "testframework": {
-                    "test_runner": {"execute_path": "exec", "command": "run"},
-                    "test_builder": {"execute_path": "build", "command": "make"},
-                },
-            }
-        ]
-    }
-    f = tmp_path / "rules.json"
-    f.write_text(json.dumps(data))
-
-    # Path input
-    rp = RulesParser(f)
-    tr = rp.get_test_runner("myproj")
-    tb = rp.get_test_builder("myproj")
-    assert tr == {"execute_path": "exec", "command": "run"}
-    assert tb == {"execute_path": "build", "command": "make"}
-
-    # String input
-    rp2 = RulesParser(str(f))
-    assert rp2.get_test_runner("myproj") == tr
-    assert rp2.get_test_builder("myproj") == tb
+@pytest.mark.parametrize("as_str", [False, True], ids=["path", "str"])
+def test_get_test_runner_and_builder_with_path_and_string(rules_dir, as_str):
+    f = rules_dir / "rules.json"
 
+    rp = RulesParser(str(f) if as_str else f)
+    assert rp.get_test_runner("myproj") == {"execute_path": "exec", "command": "run"}
+    assert rp.get_test_builder("myproj") == {"execute_path": "build", "command": "make"}
 
-def test_get_returns_none_when_missing(tmp_path):
-    data = {"project_configurations": [{"project_type": "other"}]}
-    f = tmp_path / "rules.json"
-    f.write_text(json.dumps(data))
 
-    rp = RulesParser(f)
+def test_get_returns_none_when_missing(rp_factory):
+    rp = rp_factory()
     assert rp.get_test_runner("missing") is None
     assert rp.get_test_builder("missing") is None
     # entry exists but no testframework
@@ -53,20 +35,71 @@ def test_get_returns_none_when_missing(tmp_path):
     assert rp.get_test_builder("other") is None
 
 
+def test_null_testframework_is_treated_as_missing(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"project_configurations": [{"project_type": "myproj", "testframework": None}]}))
+    rp = RulesParser(path)
+    assert rp.get_test_runner("myproj") is None
+    assert rp.get_test_builder("myproj") is None
+
+
+def test_get_methods_match_project_type_case_insensitively(rp_factory):
+    assert rp_factory().get_test_builder("MyProj") == {"execute_path": "build", "command": "make"}
+    # mapping-form project_configurations are indexed as well
+    assert rp_factory(".agent_rules.json").get_test_runner("MYPROJ") == {"command": "run"}
+    assert rp_factory().get_test_runner(None) is None
+
+
+def test_rules_reparsed_only_when_file_changes(tmp_path):
+    f = tmp_path / "rules.json"
+    f.write_bytes(_RULES_X1_JSON)
+
+    rp1 = RulesParser(f)
+    rp2 = RulesParser(f)
+    assert rp1.rules is rp2.rules
+    assert rp2.get_file_rules("a") == {"x": 1}
+
+    f.write_bytes(_RULES_X22_JSON)
+    rp3 = RulesParser(f)
+    assert rp3.get_file_rules("a") == {"x": 22}
+    assert rp1.get_file_rules("a") == {"x": 1}
+
+
+def test_rules_cache_can_be_disabled(tmp_path, monkeypatch):
+    f = tmp_path / "rules.json"
+    f.write_bytes(_RULES_X1_JSON)
+    monkeypatch.setenv("RULES_PARSER_NOCACHE", "1")
+    assert RulesParser(f).rules is not RulesParser(f).rules
+
+
+def test_loads_falls_back_to_stdlib_json(monkeypatch):
+    import rules_parser as rpmod
+
+    monkeypatch.setattr(rpmod, "orjson", None)
+    assert rpmod._loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+    with pytest.raises(json.JSONDecodeError):
+        rpmod._loads(b"{")
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_large_rules_file_parsed_from_mmap(rules_dir, monkeypatch, use_orjson):
+    import rules_parser as rpmod
+
+    monkeypatch.setattr(rpmod, "_MMAP_MIN_BYTES", 0)
+    if not use_orjson:
+        monkeypatch.setattr(rpmod, "orjson", None)
+    f = rules_dir / "rules.json"
+    assert rpmod._load_file(f, f.stat().st_size) == json.loads(f.read_bytes())
+
+
 def test_load_project_config_missing_file(tmp_path):
     # no .agent_rules.json present
     with pytest.raises(FileNotFoundError):
         RulesParser(str(tmp_path))
 
 
-def test_load_project_config_single_and_select(tmp_path):
-    data = {
-        "project_configurations": {
-            "myproj": {"project_type": "myproj", "testframework": {"test_runner": {"command": "run"}}}
-        }
-    }
-    f = tmp_path / ".agent_rules.json"
-    f.write_text(json.dumps(data))
+def test_load_project_config_single_and_select(rules_dir):
+    f = rules_dir / ".agent_rules.json"
 
     # single entry, project_type None should return the only entry
     rp = RulesParser(f)
@@ -78,15 +111,8 @@ def test_load_project_config_single_and_select(tmp_path):
     assert cfg2.get('project_type') == 'myproj'
 
 
-def test_load_project_config_multiple_requires_selection(tmp_path):
-    data = {
-        "project_configurations": [
-            {"project_type": "one"},
-            {"project_type": "two"}
-        ]
-    }
-    f = tmp_path / ".agent_rules.json"
-    f.write_text(json.dumps(data))
+def test_load_project_config_multiple_requires_selection(rules_dir):
+    f = rules_dir / "rules.json"
 
     rp = RulesParser(f)
     with pytest.raises(ValueError):
@@ -97,31 +123,9 @@ def test_load_project_config_multiple_requires_selection(tmp_path):
         rp.load_project_config('missing')
 
 
-def test_get_new_rules_methods(tmp_path):
-    data = {
-        "project_configurations": [
-            {
-                "project_type": "myproj",
-                "file_rules": {
-                    "allowed_to_modify": ["zephyr_main_app/ztests/"],
-                    "ignored_files": ["*.md", "*.txt"]
-                },
-                "cpp_code_rules": {
-                    "not_allowed_header_includes": ["zephyr.h"],
-                    "not_allowed_include_extensions": [".cpp"]
-                },
-                "cmake_rules": {
-                    "cmake_overall_guidelines": {"allow_absolute_paths": False, "allow_FILE_function": False},
-                    "not_allowed_cmake_include_dirs": ["tests/unit_tests"]
-                }
-            }
-        ]
-    }
-    f = tmp_path / "rules.json"
-    f.write_text(json.dumps(data))
-
-    rp = RulesParser(f)
-    expected = data["project_configurations"][0]
+def test_get_new_rules_methods(rp_factory, rules_data):
+    rp = rp_factory()
+    expected = rules_data["project_configurations"][0]
     assert rp.get_file_rules("myproj") == expected["file_rules"]
     assert rp.get_cpp_code_rules("myproj") == expected["cpp_code_rules"]
     assert rp.get_cmake_rules("myproj") == expected["cmake_rules"]
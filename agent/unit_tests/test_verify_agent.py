@@ -1,31 +1,19 @@
-import importlib.util
-import pathlib
-import types
+import time
 import unittest.mock
 
 
-def _load_verify_agent_module():
-    root = pathlib.Path(__file__).resolve().parents[2]
-    mod_path = root / "agent" / "verify_agent.py"
-    spec = importlib.util.spec_from_file_location("verify_agent", str(mod_path))
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    return mod
+def test_run_script_prints_and_returns_code(tmp_path, captured, verify_agent_mod):
+    script = tmp_path / 'script.py'
+    script.write_text("import sys\nprint('out')\nprint('err', file=sys.stderr)\nsys.exit(3)\n")
+    with captured() as out:
+        rc = verify_agent_mod.run_script(str(script))
+    assert rc == 3
+    assert 'out\n' in out.getvalue()
+    assert 'err\n' in out.getvalue()
 
 
-def test_run_script_prints_and_returns_code(capsys):
-    mod = _load_verify_agent_module()
-
-    fake_proc = types.SimpleNamespace(returncode=3, stdout='out\n')
-    with unittest.mock.patch.object(mod.subprocess, 'run', return_value=fake_proc):
-        rc = mod.run_script('/irrelevant')
-        captured = capsys.readouterr()
-        assert rc == 3
-        assert 'out' in captured.out
-
-
-def test_configure_test_runner_calls_make_framework_entry():
-    mod = _load_verify_agent_module()
+def test_configure_test_runner_calls_make_framework_entry(verify_agent_mod):
+    mod = verify_agent_mod
 
     class FakeRP:
         def get_test_runner(self, project_type):
@@ -56,3 +44,55 @@ def test_configure_test_runner_calls_make_framework_entry():
 
     assert first_call == (False, 'run-cmd', 'exec/path', 'run-build')
     assert second_call == (True, 'build-cmd', 'build/exec', 'build/build', ['-O3'], False)
+
+
+def test_start_script_skips_missing_file(tmp_path, verify_agent_mod):
+    assert verify_agent_mod.start_script(str(tmp_path / 'missing.py')) is None
+    script = tmp_path / 'ok.py'
+    script.write_text("import sys\nprint('hi')\nprint('err', file=sys.stderr)\nsys.exit(1)\n")
+    assert verify_agent_mod.finish_script(verify_agent_mod.start_script(str(script))) == (1, 'hi\nerr\n')
+
+
+def test_run_checks_streams_first_script_and_reports_in_order(tmp_path, monkeypatch, captured, verify_agent_mod):
+    class PassingVerifyFiles:
+        def __init__(self, rp, project_type):
+            pass
+
+        def verify(self):
+            pass
+
+        def is_passed(self):
+            return True
+
+    monkeypatch.setattr(verify_agent_mod, 'VerifyFiles', PassingVerifyFiles)
+    first = tmp_path / 'first.py'
+    first.write_text("print('first')\n")
+    second = tmp_path / 'second.py'
+    second.write_text("import sys\nprint('second')\nsys.exit(4)\n")
+    with captured() as out:
+        code = verify_agent_mod.run_checks(None, 'proj', [str(first), str(second), str(tmp_path / 'never.py')])
+    assert code == 4
+    assert out.getvalue() == 'first\nsecond\n'
+    assert verify_agent_mod.run_checks(None, 'proj', [str(tmp_path / 'missing.py')]) == 2
+
+
+def test_run_checks_stops_background_scripts_on_failure(tmp_path, monkeypatch, captured, verify_agent_mod):
+    class FailingVerifyFiles:
+        def __init__(self, rp, project_type):
+            pass
+
+        def verify(self):
+            pass
+
+        def is_passed(self):
+            return False
+
+    monkeypatch.setattr(verify_agent_mod, 'VerifyFiles', FailingVerifyFiles)
+    marker = tmp_path / 'finished'
+    slow = tmp_path / 'slow.py'
+    slow.write_text(f"import time\ntime.sleep(0.5)\nopen({str(marker)!r}, 'w').close()\n")
+    with captured():
+        assert verify_agent_mod.run_checks(None, 'proj', [str(slow), str(slow)]) == 1
+    # the background checker was terminated, not left running to completion
+    time.sleep(1.5)
+    assert not marker.exists()
@@ -1,55 +1,48 @@
-import json
+import git_file_handler
+from verify_files import VerifyFiles, _glob_matcher
 
-import pytest
+def test_verify_passes_when_files_allowed(monkeypatch, shared_rp):
+    monkeypatch.setattr(git_file_handler, "get_created_files", lambda p: ["src/main.c"])
+    monkeypatch.setattr(git_file_handler, "get_added_files", lambda p: [])
+    monkeypatch.setattr(git_file_handler, "get_modified_files", lambda p: [])
 
-from agent.rules_parser import RulesParser
-from agent.verify_files import VerifyFiles
-
-
-def _make_rules_parser(tmp_path):
-    data = {"project_configurations": [{"project_type": "myproj"}]}
-    f = tmp_path / "rules.json"
-    f.write_text(json.dumps(data))
-    rp = RulesParser(f)
-
-    # VerifyFiles currently expects the RulesParser instance to provide
-    # `get_allowed_path()` and `get_allowed_extensions()` methods. Add
-    # them dynamically on the instance for tests.
-    rp.get_allowed_path = lambda: ["src/"]
-    rp.get_allowed_extensions = lambda: [".c", ".h"]
-    return rp
-
-
-def test_verify_passes_when_files_allowed(monkeypatch, tmp_path):
-    rp = _make_rules_parser(tmp_path)
-
-    monkeypatch.setattr("agent.git_file_handler.get_created_files", lambda p: ["src/main.c"])
-    monkeypatch.setattr("agent.git_file_handler.get_added_files", lambda p: [])
-    monkeypatch.setattr("agent.git_file_handler.get_modified_files", lambda p: [])
-
-    vf = VerifyFiles(rp, "myproj")
+    vf = VerifyFiles(shared_rp, "myproj")
     assert vf.is_passed() is True
 
 
-def test_verify_fails_on_disallowed_path(monkeypatch, tmp_path):
-    rp = _make_rules_parser(tmp_path)
+def test_verify_fails_on_disallowed_path(monkeypatch, shared_rp):
+    monkeypatch.setattr(git_file_handler, "get_created_files", lambda p: ["other/file.c"])
+    monkeypatch.setattr(git_file_handler, "get_added_files", lambda p: [])
+    monkeypatch.setattr(git_file_handler, "get_modified_files", lambda p: [])
 
-    monkeypatch.setattr("agent.git_file_handler.get_created_files", lambda p: ["other/file.c"])
-    monkeypatch.setattr("agent.git_file_handler.get_added_files", lambda p: [])
-    monkeypatch.setattr("agent.git_file_handler.get_modified_files", lambda p: [])
-
-    vf = VerifyFiles(rp, "myproj")
+    vf = VerifyFiles(shared_rp, "myproj")
     assert vf.is_passed() is False
 
 
-def test_delegate_get_methods(monkeypatch, tmp_path):
-    rp = _make_rules_parser(tmp_path)
-
-    monkeypatch.setattr("agent.git_file_handler.get_created_files", lambda p: ["src/a.c"])
-    monkeypatch.setattr("agent.git_file_handler.get_added_files", lambda p: ["src/b.h"])
-    monkeypatch.setattr("agent.git_file_handler.get_modified_files", lambda p: ["src/c.c"])
+def test_delegate_get_methods(monkeypatch, shared_rp):
+    monkeypatch.setattr(git_file_handler, "get_created_files", lambda p: ["src/a.c"])
+    monkeypatch.setattr(git_file_handler, "get_added_files", lambda p: ["src/b.h"])
+    monkeypatch.setattr(git_file_handler, "get_modified_files", lambda p: ["src/c.c"])
 
-    vf = VerifyFiles(rp, "myproj")
+    vf = VerifyFiles(shared_rp, "myproj")
     assert vf.get_created_files() == ["src/a.c"]
     assert vf.get_added_files() == ["src/b.h"]
     assert vf.get_modified_files() == ["src/c.c"]
+
+
+def test_verify_does_not_modify_cached_rules(monkeypatch, shared_rp):
+    monkeypatch.setattr(git_file_handler, "get_created_files", lambda p: [])
+    monkeypatch.setattr(git_file_handler, "get_added_files", lambda p: [])
+    monkeypatch.setattr(git_file_handler, "get_modified_files", lambda p: [])
+
+    for _ in range(3):
+        VerifyFiles(shared_rp, "myproj")
+    assert shared_rp.get_file_rules("myproj")["allowed_to_modify"] == ["src/"]
+
+
+def test_glob_matcher_matches_any_pattern():
+    is_ignored = _glob_matcher(("*.md", "docs/*.txt"))
+    assert is_ignored("README.md")
+    assert is_ignored("docs/notes.txt")
+    assert not is_ignored("src/main.c")
+    assert not is_ignored("notes.txt")
@@ -4,12 +4,14 @@ import re
 
 import pytest
 
-import agent.zephyr_cmakelists_checker as zc
+import zephyr_cmakelists_checker as zc
 
 
 def test_strip_cmake_comments_and_humanize():
     s = "set(PATH 'a#b') # comment here"
     assert zc._strip_cmake_comments(s).strip() == "set(PATH 'a#b')"
+    assert zc._strip_cmake_comments('msg("x # y" z) # c\n') == 'msg("x # y" z) '
+    assert zc._strip_cmake_comments('set(A "open # quote\n') == 'set(A "open # quote\n'
     assert zc.humanize_pattern('x/') == 'x/'
     assert zc.humanize_pattern('x') == 'x'
 
@@ -17,7 +19,7 @@ def test_strip_cmake_comments_and_humanize():
 def test_default_and_load_json(tmp_path):
     p = tmp_path / 'r.json'
     data = {'a': 1}
-    p.write_text(json.dumps(data))
+    p.write_bytes(json.dumps(data).encode('utf-8'))
     loaded = zc.load_json(str(p))
     assert loaded == data
     # default path should point to module dir .agent_rules.json
@@ -25,6 +27,15 @@ def test_default_and_load_json(tmp_path):
     assert dp.endswith('.agent_rules.json')
 
 
+def test_load_json_cached_until_file_changes(tmp_path):
+    p = tmp_path / 'r.json'
+    p.write_bytes(b'{"a": 1}')
+    first = zc.load_json(str(p))
+    assert zc.load_json(str(p)) is first
+    p.write_bytes(b'{"a": 22}')
+    assert zc.load_json(str(p)) == {'a': 22}
+
+
 def test_select_project_rules_variants():
     assert zc.select_project_rules([]) == {}
     rules = {'project_configurations': [{'project_type': 'a', 'x': 1}]}
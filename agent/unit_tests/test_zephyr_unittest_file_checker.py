@@ -4,7 +4,7 @@ import re
 
 import pytest
 
-import agent.zephyr_unittest_file_checker as zf
+import zephyr_unittest_file_checker as zf
 
 
 def test_humanize_pattern_variants():
@@ -17,7 +17,7 @@ def test_humanize_pattern_variants():
 def test_select_project_rules_and_default_and_load(tmp_path):
     p = tmp_path / 'rules.json'
     data = {'project_configurations': [{'project_type': 'x', 'a': 1}]}
-    p.write_text(json.dumps(data))
+    p.write_bytes(json.dumps(data).encode('utf-8'))
     assert zf.select_project_rules(data)['project_type'] == 'x'
     loaded = zf.load_json(str(p))
     assert loaded == data
@@ -163,3 +163,26 @@ def test_absolute_include_trimming(monkeypatch, tmp_path, capsys):
     out = capsys.readouterr().out
     assert rv == 1
     assert 'foo/forbidden.h' in out
+
+
+def test_glob_matcher_combines_patterns():
+    match = zf._glob_matcher(('*.md', 'src/gen_*'))
+    assert match('README.md')
+    assert match('src/gen_table.c')
+    assert not match('src/main.c')
+    # no patterns must not match everything
+    assert not zf._glob_matcher(())('anything.c')
+
+
+def test_token_match_reported_after_skipped_path_pattern(monkeypatch, tmp_path, capsys):
+    repo = tmp_path / 'repo'
+    (repo / '.git').mkdir(parents=True)
+    (repo / 'src').mkdir()
+    (repo / 'src' / 'tok.c').write_text('int x = token_here;\n')
+    # 'lib/util.hpp' gets no per-line regex; 'token_here' must keep its own label
+    data = {'project_configurations': [{'project_type': 'p', 'allowed_to_modify': ['src/'],
+                                        'cpp_code_rules': {'not_allowed_header_includes': ['lib/util.hpp', 'token_here']}}]}
+    monkeypatch.setattr(zf, 'find_git_root', lambda x=None: str(repo))
+    monkeypatch.setattr(zf, 'git_changed_files', lambda: ['src/tok.c'])
+    assert zf.run_check(data) == 1
+    assert 'Not allowed include found: token_here' in capsys.readouterr().out
@@ -1,22 +1,28 @@
 import os
-from pathlib import Path
 import xml.etree.ElementTree as ET
 
-import agent.zephyr_verify_coverage as zv
+import zephyr_verify_coverage as zv
 
 
-REPORTS_DIR = Path(__file__).resolve().parents[2] / 'reports'
-COVERAGE_PATH = REPORTS_DIR / 'coverage.xml'
+REPORTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'reports'))
+COVERAGE_PATH = os.path.join(REPORTS_DIR, 'coverage.xml')
+
+
+def _remove_coverage():
+    try:
+        os.remove(COVERAGE_PATH)
+    except FileNotFoundError:
+        pass
 
 
 def setup_file(content: str | None):
-    REPORTS_DIR.mkdir(exist_ok=True)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
     if content is None:
         # remove file if exists
-        if COVERAGE_PATH.exists():
-            COVERAGE_PATH.unlink()
+        _remove_coverage()
         return
-    COVERAGE_PATH.write_text(content)
+    with open(COVERAGE_PATH, 'w') as fh:
+        fh.write(content)
 
 
 def test_coverage_from_xml_root_line_rate(tmp_path):
@@ -73,14 +79,14 @@ class pytest_float_wrapper:
 def test_main_missing_and_empty_and_invalid(tmp_path, capsys):
     # backup existing
     bak = None
-    if COVERAGE_PATH.exists():
-        bak = COVERAGE_PATH.read_text()
-        COVERAGE_PATH.unlink()
+    if os.path.exists(COVERAGE_PATH):
+        with open(COVERAGE_PATH) as fh:
+            bak = fh.read()
+        os.remove(COVERAGE_PATH)
 
     try:
         # missing file
-        if COVERAGE_PATH.exists():
-            COVERAGE_PATH.unlink()
+        _remove_coverage()
         rc = zv.main()
         out = capsys.readouterr().out
         assert rc == 1
@@ -102,10 +108,9 @@ def test_main_missing_and_empty_and_invalid(tmp_path, capsys):
     finally:
         # restore
         if bak is not None:
-            COVERAGE_PATH.write_text(bak)
+            setup_file(bak)
         else:
-            if COVERAGE_PATH.exists():
-                COVERAGE_PATH.unlink()
+            _remove_coverage()
 
 
 def test_main_low_and_ok(tmp_path, capsys):
@@ -2,7 +2,8 @@
 #!/usr/bin/env python3
 """Run verification steps in order.
 
-This script runs the following, in sequence, stopping on the first failure:
+This script runs the following, stopping on the first failure (the checker
+scripts run concurrently, their results are reported in order):
  - verify_files.py
  - zephyr_unittest_allowed_includes.py
 
@@ -18,16 +19,42 @@ import json
 import os
 import subprocess
 import sys
+import tempfile
+from typing import IO
 from rules_parser import RulesParser
 from build_and_run_tests import TestRunner
 from verify_files import VerifyFiles
 
 
+def start_script(path: str) -> tuple[subprocess.Popen, IO[str]] | None:
+	"""Start a Python script in the background, or return None when `path`
+	is not a file.
+
+	Its combined output goes to an anonymous temporary file rather than a
+	pipe, so the script never stalls on a full pipe nobody is reading yet.
+	"""
+	if not os.path.isfile(path):
+		return None
+	output = tempfile.TemporaryFile(mode="w+", encoding="utf-8", errors="replace")
+	proc = subprocess.Popen([sys.executable, path], stdout=output, stderr=subprocess.STDOUT)
+	return proc, output
+
+
+def finish_script(started: tuple[subprocess.Popen, IO[str]]) -> tuple[int, str]:
+	"""Wait for a script from start_script; return its exit code and output."""
+	proc, output = started
+	with output:
+		code = proc.wait()
+		output.seek(0)
+		return code, output.read()
+
+
 def run_script(path: str) -> int:
+	"""Run a Python script, echoing its combined output as it arrives."""
 	cmd = [sys.executable, path]
-	proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-	if proc.stdout:
-		print(proc.stdout, end='')
+	with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1) as proc:
+		for line in proc.stdout:
+			sys.stdout.write(line)
 	return proc.returncode
 
 
@@ -58,6 +85,54 @@ def configure_test_runner(rp: RulesParser, tr: TestRunner, project_type: str) ->
 	)
 
 
+def run_checks(rp: RulesParser, project_type: str, steps: list[str]) -> int:
+	"""Verify the changed files and run the checker `steps`.
+
+	The checker scripts depend neither on each other nor on the file
+	verification, so all but the first run in the background while
+	VerifyFiles works. The first streams its output once VerifyFiles passed;
+	the others are reported in order after it, stopping on the first failure.
+	Returns 0 when everything passed, else the exit code for main.
+	"""
+	started = {script: start_script(script) for script in steps[1:]}
+	try:
+		# Running verify_files class
+		vf = VerifyFiles(rp, project_type)
+		vf.verify()
+		if not vf.is_passed():
+			print("File verification failed", file=sys.stderr)
+			return 1
+
+		#running scripts
+		for script in steps:
+			if script in started:
+				entry = started.pop(script)
+				result = None if entry is None else finish_script(entry)
+			elif os.path.isfile(script):
+				result = run_script(script), ''
+			else:
+				result = None
+			if result is None:
+				print(f"Error: script not found: {script}", file=sys.stderr)
+				return 2
+
+			code, output = result
+			if output:
+				print(output, end='')
+			if code != 0:
+				print(f"Stopped: {os.path.basename(script)} exited with code {code}", file=sys.stderr)
+				return code
+		return 0
+	finally:
+		# a failure makes the remaining results moot: stop those checkers
+		for entry in started.values():
+			if entry is not None:
+				proc, output = entry
+				proc.terminate()
+				proc.wait()
+				output.close()
+
+
 def main() -> int:
 	here = os.path.dirname(os.path.abspath(__file__))
 	parser = argparse.ArgumentParser(description='Run verification steps and optionally build a unit test')
@@ -66,6 +141,9 @@ def main() -> int:
 	parser.add_argument('--run_tests', dest='run_test', nargs='?', const='', metavar='PATH', help='Alias for --run_test')
 	parser.add_argument('--project', metavar='NAME', help='Project type from .agent_rules.json (case-insensitive)')
 	parser.add_argument('--rule_set', metavar='PATH', help='Path to .agent_rules.json (defaults to script directory)')
+	parser.add_argument('--test-jobs', type=int, metavar='N', help='Number of tests ctest runs in parallel (defaults to CPU cores minus two)')
+	parser.add_argument('--shard', action='store_true', help='Split the test set into balanced shards run as concurrent ctest processes')
+	parser.add_argument('--clean', action='store_true', help='Remove the build directory before building instead of building incrementally')
 	args = parser.parse_args()
 	
 	# Verify args
@@ -93,13 +171,10 @@ def main() -> int:
 	# configure test runner with project-specific command and path
 	tr = TestRunner()
 	configure_test_runner(rp, tr, args.project)
+	if args.test_jobs is not None:
+		tr.test_jobs = max(1, args.test_jobs)
+	tr.shard = args.shard
 
-	# Running verify_files class
-	vf = VerifyFiles(rp, args.project)
-	vf.verify()
-	if not vf.is_passed():
-		print("File verification failed", file=sys.stderr)
-		return 1
 	# os.path.join(here, 'verify_files.py'),
 	steps = [
 		os.path.join(here, 'zephyr_cmakelists_checker.py'),
@@ -107,26 +182,20 @@ def main() -> int:
 		os.path.join(here, 'zephyr_unittest_file_checker.py'),
 	]
 
-	#running scripts
-	for script in steps:
-		if not os.path.isfile(script):
-			print(f"Error: script not found: {script}", file=sys.stderr)
-			return 2
-
-		code = run_script(script)
-		if code != 0:
-			print(f"Stopped: {os.path.basename(script)} exited with code {code}", file=sys.stderr)
-			return code
+	code = run_checks(rp, args.project, steps)
+	if code != 0:
+		return code
 
 	# If requested, run build step after successful checks
 	if args.build is not None:
-		tr.make_build()
+		tr.make_build(clean=args.clean)
 		if tr._failed:
 			# Build failed no reason to attempt running tests
 			sys.exit(1)
 		
 	if args.run_test is not None:
-		tr.make_testrun()
+		# a build requested above already honoured --clean
+		tr.make_testrun(clean=args.clean and args.build is None)
 		if tr._failed:
 			# Test run failed no reason to attempt coverage check
 			sys.exit(1)
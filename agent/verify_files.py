@@ -10,13 +10,25 @@ from __future__ import annotations
 
 from pathlib import Path
 import fnmatch
+import functools
+import re
 import sys
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from rules_parser import RulesParser
 import git_file_handler
 
 
+@functools.lru_cache(maxsize=None)
+def _glob_matcher(patterns: Tuple[str, ...]) -> Callable[[str], Optional[re.Match]]:
+    """Return a match function accepting names that fnmatch any of `patterns`.
+
+    The patterns are joined into one compiled regex, so each name is
+    checked in a single pass instead of once per pattern.
+    """
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns)).match
+
+
 class VerifyFiles:
     """Inspect repository files for a project using provided rules.
 
@@ -51,13 +63,16 @@ class VerifyFiles:
         files =[]
         self.passed = False
         self.error_files = []
-        allowed_paths = []
-        files.append(self.get_created_files())
-        files.append(self.get_added_files())
-        files.append(self.get_modified_files())
-        allowed_paths = self.get_allowed_path() or []
-        allowed_paths.append(self.get_relative_agent_path())
+        # one git status serves all three queries
+        with git_file_handler.status_snapshot():
+            files.append(self.get_created_files())
+            files.append(self.get_added_files())
+            files.append(self.get_modified_files())
+        # a new list: get_allowed_path returns the parser's cached rules
+        allowed_paths = [*(self.get_allowed_path() or []), self.get_relative_agent_path()]
+        allowed_prefixes = tuple(allowed_paths)
         ignored_exts = self.get_ignored_file_extensions()
+        is_ignored = _glob_matcher(tuple(ignored_exts)) if ignored_exts else None
         #print(f"Allowed paths: {allowed_paths}")
         #print(f"Ignored extensions: {ignored_exts}")
         #print(f"Files to verify: {files}")
@@ -66,9 +81,9 @@ class VerifyFiles:
             for f in file_list:
                 if f.startswith("./"):
                     f = f[2:]
-                if allowed_paths and any(f.startswith(p) for p in allowed_paths):
+                if allowed_prefixes and f.startswith(allowed_prefixes):
                     continue
-                if ignored_exts and any(fnmatch.fnmatch(f, pattern) for pattern in ignored_exts):
+                if is_ignored and is_ignored(f):
                     continue
                 self.error_files.append(f)
                 print(f"File '{f}' is not in allowed paths and does not have an ignored extension.")
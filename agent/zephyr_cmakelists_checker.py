@@ -13,11 +13,13 @@ Behavior:
 """
 from __future__ import annotations
 
+import functools
 import json
 import os
 import re
 import sys
-from typing import Any, Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
 import sys as _sys_for_import
 import os as _os_for_import
 # make sure local tools dir is importable
@@ -30,29 +32,25 @@ except Exception:
     get_changed_files = None
 
 
+# Compiled once at import; run_check applies them to every line of every
+# changed CMakeLists.txt.
+# Code up to the first '#' outside quotes; an unterminated quote runs to the end.
+_RE_CMAKE_CODE = re.compile(r"""(?:[^'"#]|"[^"]*"?|'[^']*'?)*""")
+_RE_SET = re.compile(r"^\s*set\s*\(\s*([A-Za-z0-9_]+)\s+([^\)]+)\)", re.IGNORECASE)
+_RE_FILE_CMD = re.compile(r"\bfile\s*\(", re.IGNORECASE)
+_RE_ADD_SUBDIR = re.compile(r'\badd_subdirectory\s*\(', re.IGNORECASE)
+_RE_TLL = re.compile(r'\btarget_link_libraries\s*\(', re.IGNORECASE)
+_RE_TID = re.compile(r'\btarget_include_directories\s*\(', re.IGNORECASE)
+_RE_PARENT_PATH = re.compile(r"(\.{2}/(?:\.{2}/)*[^\s',\)\"]*)")
+_RE_TOKEN_SEP = re.compile(r'[\s,]+')
+
+
 def _strip_cmake_comments(line: str) -> str:
     """Return the line with CMake '#' comments removed, preserving quoted text.
 
     This stops at the first '#' that is not inside single or double quotes.
     """
-    out_chars = []
-    in_sq = False
-    in_dq = False
-    i = 0
-    while i < len(line):
-        c = line[i]
-        if c == "'" and not in_dq:
-            in_sq = not in_sq
-            out_chars.append(c)
-        elif c == '"' and not in_sq:
-            in_dq = not in_dq
-            out_chars.append(c)
-        elif c == '#' and not in_sq and not in_dq:
-            break
-        else:
-            out_chars.append(c)
-        i += 1
-    return ''.join(out_chars)
+    return _RE_CMAKE_CODE.match(line).group()
 
 
 def humanize_pattern(pat: str) -> str:
@@ -65,9 +63,21 @@ def default_agent_rules_path() -> str:
     return os.path.join(os.path.dirname(os.path.abspath(__file__)), '.agent_rules.json')
 
 
+@functools.lru_cache(maxsize=32)
+def _load_json_cached(path: str, mtime_ns: int, size: int) -> Any:
+    # json accepts the raw UTF-8 bytes, no text-mode decode needed
+    with open(path, 'rb') as fh:
+        return json.loads(fh.read())
+
+
 def load_json(path: str) -> Any:
-    with open(path, 'r', encoding='utf-8') as fh:
-        return json.load(fh)
+    """Parse the JSON file at `path`.
+
+    The result is cached until the file's mtime or size changes and is
+    shared between callers, so treat it as read-only.
+    """
+    st = os.stat(path)
+    return _load_json_cached(os.path.abspath(path), st.st_mtime_ns, st.st_size)
 
 
 def select_project_rules(rules: Any) -> dict:
@@ -90,7 +100,12 @@ def select_project_rules(rules: Any) -> dict:
 
 
 def find_git_root(start: Optional[str] = None) -> Optional[str]:
-    d = os.path.abspath(start or os.path.dirname(os.path.abspath(__file__)))
+    return _find_git_root(os.path.abspath(start or os.path.dirname(os.path.abspath(__file__))))
+
+
+@functools.lru_cache(maxsize=256)
+def _find_git_root(d: str) -> Optional[str]:
+    # cached per start directory: the walk stats every level up to the root
     while True:
         if os.path.isdir(os.path.join(d, '.git')):
             return d
@@ -107,22 +122,28 @@ def git_changed_files(repo_dir: Optional[str] = None) -> List[str]:
         raise RuntimeError('git_file_handler.get_changed_files is unavailable')
 
     info = get_changed_files(cwd)
-    # flatten info dict into a stable list preserving a sensible order
-    out: List[str] = []
-    for key in ("created", "added", "modified", "deleted"):
-        for p in info.get(key, []):
-            if p not in out:
-                out.append(p)
-    return out
+    # flatten info dict into a stable list preserving a sensible order;
+    # dict keys dedupe in O(1) per path while keeping first-seen order
+    return list(dict.fromkeys(p for key in ("created", "added", "modified", "deleted") for p in info.get(key, [])))
 
 
 def path_allowed(path: str, allowed_prefixes: Iterable[str]) -> bool:
-    p = path.replace('\\', '/')
-    for pref in allowed_prefixes:
-        pref_norm = pref.replace('\\', '/')
-        if p.startswith(pref_norm):
-            return True
-    return False
+    # allowed entries are literal prefixes (no globbing): one startswith call
+    # over all of them
+    prefixes = tuple(pref.replace('\\', '/') for pref in allowed_prefixes)
+    return path.replace('\\', '/').startswith(prefixes)
+
+
+def _scan_files(scan: Callable[[str], Any], files: List[str]) -> List[Any]:
+    """Apply `scan` to each file and return the results in input order.
+
+    Files are independent, so several are scanned on a thread pool; the
+    reads overlap, and the results are still merged in a fixed order.
+    """
+    if len(files) < 2:
+        return [scan(f) for f in files]
+    with ThreadPoolExecutor() as pool:
+        return list(pool.map(scan, files))
 
 
 def run_check(data: Any) -> int:
@@ -158,7 +179,6 @@ def run_check(data: Any) -> int:
         print('OK')
         return 0
 
-    errors_found = []
     git_root = find_git_root() or os.getcwd()
 
     # Prepare regexes for not_allowed entries. If entry ends with '/', match as directory prefix.
@@ -184,12 +204,14 @@ def run_check(data: Any) -> int:
         checks.append((pat, rx, 'linked_lib'))
 
     # path extractor to prefer showing the actual included subdirectory/token
-    path_extractor = re.compile(r"(\.{2}/(?:\.{2}/)*[^\s',\)\"]*)")
+    path_extractor = _RE_PARENT_PATH
 
-    for rel in relevant:
+    def scan(rel: str) -> tuple[list, Optional[str]]:
+        """Check one CMakeLists.txt; return its findings and a read warning, if any."""
+        errors_found = []
         full = os.path.join(git_root, rel)
         if not os.path.isfile(full):
-            continue
+            return errors_found, None
         try:
             with open(full, 'r', encoding='utf-8', errors='replace') as fh:
                 lines = fh.readlines()
@@ -197,9 +219,8 @@ def run_check(data: Any) -> int:
             # strip comments and collect simple set(VAR value) assignments to allow basic variable expansion
             cleaned_lines = [_strip_cmake_comments(ln) for ln in lines]
             var_map: dict[str, str] = {}
-            set_rx = re.compile(r"^\s*set\s*\(\s*([A-Za-z0-9_]+)\s+([^\)]+)\)", re.IGNORECASE)
             for ln in cleaned_lines:
-                m = set_rx.match(ln)
+                m = _RE_SET.match(ln)
                 if m:
                     name = m.group(1)
                     val = m.group(2).strip()
@@ -207,9 +228,8 @@ def run_check(data: Any) -> int:
 
             if not allow_file_function:
                 # Disallow usage of the FILE(...) CMake command in changed CMakeLists.txt
-                file_cmd_rx = re.compile(r"\bfile\s*\(", re.IGNORECASE)
                 for idx_line, cl in enumerate(cleaned_lines, start=1):
-                    if file_cmd_rx.search(cl):
+                    if _RE_FILE_CMD.search(cl):
                         errors_found.append((rel, idx_line, 'FILE(', 'file_command', 'FILE('))
 
             for i, (orig_line, line) in enumerate(zip(lines, cleaned_lines), start=1):
@@ -224,9 +244,10 @@ def run_check(data: Any) -> int:
                         v = v.lstrip('/')
                         expanded = expanded.replace(token, v)
 
+                is_add_subdir = _RE_ADD_SUBDIR.search(expanded) is not None
                 for pat, rx, kind in checks:
                     # For subdirectory rules, only consider lines that invoke add_subdirectory()
-                    if kind == 'subdirectory' and not re.search(r'\badd_subdirectory\s*\(', expanded, re.IGNORECASE):
+                    if kind == 'subdirectory' and not is_add_subdir:
                         continue
 
                     # linked_lib checks are handled separately by scanning target_link_libraries blocks
@@ -248,7 +269,7 @@ def run_check(data: Any) -> int:
             idx = 0
             while idx < len(cleaned_lines):
                 ln = cleaned_lines[idx]
-                if re.search(r'\btarget_link_libraries\s*\(', ln, re.IGNORECASE):
+                if _RE_TLL.search(ln):
                     start_idx = idx
                     paren_count = ln.count('(') - ln.count(')')
                     content_parts = [ln]
@@ -283,7 +304,7 @@ def run_check(data: Any) -> int:
                 idx2 = 0
                 while idx2 < len(cleaned_lines):
                     ln2 = cleaned_lines[idx2]
-                    if re.search(r'\btarget_include_directories\s*\(', ln2, re.IGNORECASE):
+                    if _RE_TID.search(ln2):
                         start_idx2 = idx2
                         paren_count2 = ln2.count('(') - ln2.count(')')
                         idx2 += 1
@@ -298,7 +319,7 @@ def run_check(data: Any) -> int:
                         # Inspect each line in the block for tokens that literally start with '/'
                         for offset, bline in enumerate(block_lines):
                             # split into tokens by whitespace and commas
-                            for token in re.split(r'[\s,]+', bline.strip()):
+                            for token in _RE_TOKEN_SEP.split(bline.strip()):
                                 if not token:
                                     continue
                                 # remove surrounding quotes and trailing paren
@@ -312,7 +333,14 @@ def run_check(data: Any) -> int:
                         continue
                     idx2 += 1
         except Exception as e:
-            print(f"Warning: could not read {rel}: {e}", file=sys.stderr)
+            return errors_found, f"Warning: could not read {rel}: {e}"
+        return errors_found, None
+
+    errors_found = []
+    for found, warning in _scan_files(scan, relevant):
+        errors_found.extend(found)
+        if warning:
+            print(warning, file=sys.stderr)
 
     if errors_found:
         for rel, lineno, pat, kind, excerpt in errors_found:
@@ -10,12 +10,15 @@ The default file is the `.agent_rules.json` located next to this script.
 """
 from __future__ import annotations
 
+import bisect
+import functools
 import json
 import os
 import sys
 import re
-from typing import Any, Iterable, List, Optional
+from typing import Any, Callable, Iterable, List, Optional
 import fnmatch
+from concurrent.futures import ThreadPoolExecutor
 import sys as _sys_for_import
 import os as _os_for_import
 # ensure local tools dir is importable
@@ -47,9 +50,21 @@ def default_agent_rules_path() -> str:
     return os.path.join(os.path.dirname(os.path.abspath(__file__)), '.agent_rules.json')
 
 
+@functools.lru_cache(maxsize=32)
+def _load_json_cached(path: str, mtime_ns: int, size: int) -> Any:
+    # json accepts the raw UTF-8 bytes, no text-mode decode needed
+    with open(path, 'rb') as fh:
+        return json.loads(fh.read())
+
+
 def load_json(path: str) -> Any:
-    with open(path, 'r', encoding='utf-8') as fh:
-        return json.load(fh)
+    """Parse the JSON file at `path`.
+
+    The result is cached until the file's mtime or size changes and is
+    shared between callers, so treat it as read-only.
+    """
+    st = os.stat(path)
+    return _load_json_cached(os.path.abspath(path), st.st_mtime_ns, st.st_size)
 
 
 def select_project_rules(rules: Any) -> dict:
@@ -87,7 +102,12 @@ def main() -> int:
 
 
 def find_git_root(start: Optional[str] = None) -> Optional[str]:
-    d = os.path.abspath(start or os.path.dirname(os.path.abspath(__file__)))
+    return _find_git_root(os.path.abspath(start or os.path.dirname(os.path.abspath(__file__))))
+
+
+@functools.lru_cache(maxsize=256)
+def _find_git_root(d: str) -> Optional[str]:
+    # cached per start directory: the walk stats every level up to the root
     while True:
         if os.path.isdir(os.path.join(d, '.git')):
             return d
@@ -104,21 +124,42 @@ def git_changed_files(repo_dir: Optional[str] = None) -> List[str]:
         raise RuntimeError('git_file_handler.get_changed_files is unavailable')
 
     info = get_changed_files(cwd)
-    out: List[str] = []
-    for key in ("created", "added", "modified", "deleted"):
-        for p in info.get(key, []):
-            if p not in out:
-                out.append(p)
-    return out
+    # dict keys dedupe in O(1) per path while keeping first-seen order
+    return list(dict.fromkeys(p for key in ("created", "added", "modified", "deleted") for p in info.get(key, [])))
+
+
+_BLOCK_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+_INCLUDE_RE = re.compile(r'#\s*include\s*[<\"]\s*([^>\"]+)\s*[>\"]')
+
+
+@functools.lru_cache(maxsize=512)
+def _glob_matcher(patterns: tuple) -> Callable[[str], Any]:
+    """Return a match function for names that fnmatch any of `patterns`.
+
+    The globs are translated and compiled once into a single regex.
+    """
+    if not patterns:
+        return lambda name: None
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns)).match
 
 
 def path_allowed(path: str, allowed_prefixes: Iterable[str]) -> bool:
-    p = path.replace('\\', '/')
-    for pref in allowed_prefixes:
-        pref_norm = pref.replace('\\', '/')
-        if p.startswith(pref_norm):
-            return True
-    return False
+    # allowed entries are literal prefixes (no globbing): one startswith call
+    # over all of them
+    prefixes = tuple(pref.replace('\\', '/') for pref in allowed_prefixes)
+    return path.replace('\\', '/').startswith(prefixes)
+
+
+def _scan_files(scan: Callable[[str], Any], files: List[str]) -> List[Any]:
+    """Apply `scan` to each file and return the results in input order.
+
+    Files are independent, so several are scanned on a thread pool; the
+    reads overlap, and the results are still merged in a fixed order.
+    """
+    if len(files) < 2:
+        return [scan(f) for f in files]
+    with ThreadPoolExecutor() as pool:
+        return list(pool.map(scan, files))
 
 
 def run_check(data: Any) -> int:
@@ -152,18 +193,13 @@ def run_check(data: Any) -> int:
     # Filter files to those under allowed prefixes
     relevant = [p for p in changed if path_allowed(p, allowed)]
 
+    ignored_match = _glob_matcher(tuple(ignored))
+
     def is_ignored(path: str) -> bool:
         # Check against ignored patterns. Match basename, full path, and normalized path.
         bn = os.path.basename(path)
         norm = path.replace('\\', '/')
-        for pat in ignored:
-            if fnmatch.fnmatch(bn, pat):
-                return True
-            if fnmatch.fnmatch(path, pat):
-                return True
-            if fnmatch.fnmatch(norm, pat):
-                return True
-        return False
+        return bool(ignored_match(bn) or ignored_match(path) or ignored_match(norm))
 
     # Remove ignored files from relevant
     relevant = [p for p in relevant if not is_ignored(p)]
@@ -172,40 +208,42 @@ def run_check(data: Any) -> int:
     # under the allowed prefixes so unit-test mock files are validated as well.
     if not relevant:
         git_root = find_git_root() or os.getcwd()
+        seen = set()
         for pref in allowed:
             pref_path = os.path.join(git_root, pref)
             if os.path.isdir(pref_path):
                 for root, dirs, files in os.walk(pref_path):
                     for fn in files:
                         relp = os.path.relpath(os.path.join(root, fn), git_root)
-                        if relp not in relevant and not is_ignored(relp):
+                        if relp not in seen and not is_ignored(relp):
+                            seen.add(relp)
                             relevant.append(relp)
             else:
                 # If prefix is a file path relative to repo, include it if present
                 candidate = os.path.join(git_root, pref)
                 if os.path.isfile(candidate):
                     relp = os.path.relpath(candidate, git_root)
-                    if relp not in relevant and not is_ignored(relp):
+                    if relp not in seen and not is_ignored(relp):
+                        seen.add(relp)
                         relevant.append(relp)
 
     if not relevant:
         print('OK')
         return 0
 
-    errors_found = []
     git_root = find_git_root() or os.getcwd()
     # prepare regexes for not_allowed patterns.
     # If pattern ends with '/', match either '/' or '.' after the base (legacy behavior).
     # If pattern is a filename like 'zephyr.h', match common #include forms.
-    regexes = []
+    checks = []
     for pat in not_allowed:
         if pat.endswith('/'):
             # Match folder-like patterns only in include lines to avoid
             # matching these fragments in arbitrary files (comments, scripts).
             base = re.escape(pat[:-1])
-            regexes.append(re.compile(r'#\s*include\s*[<\"]\s*' + base + r'(?:[/.][^>\"]*)?[>\"]'))
+            checks.append((pat, re.compile(r'#\s*include\s*[<\"]\s*' + base + r'(?:[/.][^>\"]*)?[>\"]')))
         elif pat.endswith('.h'):
-            regexes.append(re.compile(r'#\s*include\s*[<\"]\s*' + re.escape(pat) + r'\s*[>\"]'))
+            checks.append((pat, re.compile(r'#\s*include\s*[<\"]\s*' + re.escape(pat) + r'\s*[>\"]')))
         else:
             # If pattern contains path separators, avoid generic matching across
             # arbitrary files (prevents matching inside tool scripts). Path-like
@@ -213,31 +251,35 @@ def run_check(data: Any) -> int:
             # restricted full-file fragment search for C/C++ files.
             if '/' in pat:
                 continue
-            regexes.append(re.compile(re.escape(pat)))
-    for rel in relevant:
+            checks.append((pat, re.compile(re.escape(pat))))
+    # One alternation of all checks screens each line in a single pass; the
+    # per-pattern regexes only run on lines it hits.
+    any_check = re.compile('|'.join(f'(?:{rx.pattern})' for _, rx in checks)) if checks else None
+
+    def scan(rel: str) -> tuple[list, Optional[str]]:
+        """Check one file; return its findings and a read warning, if any."""
+        errors_found = []
         full = os.path.join(git_root, rel)
         if not os.path.isfile(full):
             # skip directories or missing files
-            continue
+            return errors_found, None
         # skip ignored files (re-check with full path)
         if is_ignored(rel):
-            continue
+            return errors_found, None
         try:
             with open(full, 'r', encoding='utf-8', errors='replace') as fh:
                 text = fh.read()
                 # Identify block-comment spans (/* ... */) so we can ignore includes inside them
-                block_spans = []
-                for bb in re.finditer(r'/\*.*?\*/', text, flags=re.DOTALL):
-                    block_spans.append((bb.start(), bb.end()))
+                block_spans = [(bb.start(), bb.end()) for bb in _BLOCK_COMMENT_RE.finditer(text)]
+                # the spans are sorted and disjoint, so a bisect finds the candidate
+                block_starts = [a for a, _ in block_spans]
                 def idx_in_block(idx: int) -> bool:
-                    for a, b in block_spans:
-                        if a <= idx < b:
-                            return True
-                    return False
+                    k = bisect.bisect_right(block_starts, idx) - 1
+                    return k >= 0 and idx < block_spans[k][1]
+                lines = text.splitlines()
                 # Map block-comment spans to line numbers to skip per-line checks
                 commented_lines = set()
                 if block_spans:
-                    lines = text.splitlines()
                     # compute line start indices
                     line_starts = []
                     pos = 0
@@ -245,18 +287,18 @@ def run_check(data: Any) -> int:
                         line_starts.append(pos)
                         pos += len(ln) + 1
                     for a, b in block_spans:
-                        start_line = 1 + sum(1 for s in line_starts if s <= a) - 1
-                        end_line = 1 + sum(1 for s in line_starts if s <= b) - 1
-                        for L in range(start_line, end_line + 1):
-                            commented_lines.add(L)
-                
+                        start_line = bisect.bisect_right(line_starts, a)
+                        end_line = bisect.bisect_right(line_starts, b)
+                        commented_lines.update(range(start_line, end_line + 1))
+
                 # Per-line checks (legacy behavior) — ignore includes inside comments
-                for i, line in enumerate(text.splitlines(), start=1):
+                for i, line in enumerate(lines, start=1):
                     if i in commented_lines:
                         continue
                     # detect line comment start
                     line_comment_pos = line.find('//')
-                    for pat, rx in zip(not_allowed, regexes):
+                    hits = checks if any_check is not None and any_check.search(line) else ()
+                    for pat, rx in hits:
                         mrx = rx.search(line)
                         if not mrx:
                             continue
@@ -265,7 +307,7 @@ def run_check(data: Any) -> int:
                             continue
                         errors_found.append((rel, i, pat, line.rstrip('\n')))
 
-                    m = re.search(r'#\s*include\s*[<\"]\s*([^>\"]+)\s*[>\"]', line)
+                    m = _INCLUDE_RE.search(line)
                     if m:
                         # if include is after a '//' comment on the same line, skip
                         if line_comment_pos != -1 and m.start() >= line_comment_pos:
@@ -303,45 +345,37 @@ def run_check(data: Any) -> int:
                 ext = os.path.splitext(full)[1].lower()
                 allowed_exts = {'.c', '.cpp', '.cc', '.cxx', '.h', '.hpp', '.hh', '.inl'}
                 if ext in allowed_exts:
+                    search_text = text.replace('\\', '/')
+                    search_lines = search_text.splitlines()
                     for pat in not_allowed:
-                        # Folder-like patterns
-                        if pat.endswith('/'):
-                            pat_norm = pat.replace('\\', '/')
-                            search_text = text.replace('\\', '/')
-                            idx = search_text.find(pat_norm)
-                            while idx != -1:
-                                # ignore occurrences inside block comments
-                                if idx_in_block(idx):
-                                    idx = search_text.find(pat_norm, idx + 1)
-                                    continue
-                                # ignore if occurrence is after '//' on same line
-                                line_start = search_text.rfind('\n', 0, idx) + 1
-                                if '//' in search_text[line_start:idx]:
-                                    idx = search_text.find(pat_norm, idx + 1)
-                                    continue
-                                lineno = search_text.count('\n', 0, idx) + 1
-                                excerpt_line = search_text.splitlines()[lineno-1] if lineno-1 < len(search_text.splitlines()) else ''
-                                errors_found.append((rel, lineno, pat, excerpt_line))
+                        # Folder-like ('dir/') and path-like ('dir/file.h') patterns
+                        if '/' not in pat:
+                            continue
+                        pat_norm = pat.replace('\\', '/')
+                        idx = search_text.find(pat_norm)
+                        while idx != -1:
+                            # ignore occurrences inside block comments
+                            if idx_in_block(idx):
                                 idx = search_text.find(pat_norm, idx + 1)
-                        # Path-like patterns containing directories
-                        elif '/' in pat:
-                            pat_norm = pat.replace('\\', '/')
-                            search_text = text.replace('\\', '/')
-                            idx = search_text.find(pat_norm)
-                            while idx != -1:
-                                if idx_in_block(idx):
-                                    idx = search_text.find(pat_norm, idx + 1)
-                                    continue
-                                line_start = search_text.rfind('\n', 0, idx) + 1
-                                if '//' in search_text[line_start:idx]:
-                                    idx = search_text.find(pat_norm, idx + 1)
-                                    continue
-                                lineno = search_text.count('\n', 0, idx) + 1
-                                excerpt_line = search_text.splitlines()[lineno-1] if lineno-1 < len(search_text.splitlines()) else ''
-                                errors_found.append((rel, lineno, pat, excerpt_line))
+                                continue
+                            # ignore if occurrence is after '//' on same line
+                            line_start = search_text.rfind('\n', 0, idx) + 1
+                            if '//' in search_text[line_start:idx]:
                                 idx = search_text.find(pat_norm, idx + 1)
+                                continue
+                            lineno = search_text.count('\n', 0, idx) + 1
+                            excerpt_line = search_lines[lineno-1] if lineno-1 < len(search_lines) else ''
+                            errors_found.append((rel, lineno, pat, excerpt_line))
+                            idx = search_text.find(pat_norm, idx + 1)
         except Exception as e:
-            print(f"Warning: could not read {rel}: {e}", file=sys.stderr)
+            return errors_found, f"Warning: could not read {rel}: {e}"
+        return errors_found, None
+
+    errors_found = []
+    for found, warning in _scan_files(scan, relevant):
+        errors_found.extend(found)
+        if warning:
+            print(warning, file=sys.stderr)
 
     if errors_found:
         # Deduplicate identical findings while preserving order
@@ -13,77 +13,95 @@ from __future__ import annotations
 import os
 import sys
 import xml.etree.ElementTree as ET
+from typing import Iterator
+
+
+def _iter_attrs(path: str) -> Iterator[dict]:
+    """Yield the attributes of every element of the XML file in document order.
+
+    The file is parsed incrementally and finished elements are cleared, so
+    memory use does not grow with the size of the report. Parse errors
+    propagate to the caller.
+    """
+    root = None
+    depth = 0
+    for event, el in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = el
+            depth += 1
+            yield el.attrib
+        else:
+            depth -= 1
+            el.clear()
+            if depth == 1:
+                # drop the finished top-level subtree from the root as well
+                root.clear()
+
+
+def _rate_percent(lr: str | None) -> float | None:
+    if lr is None:
+        return None
+    try:
+        return float(lr) * 100.0
+    except Exception:
+        return None
 
 
 def coverage_from_xml(path: str) -> float | None:
+    root_pct = None
+    first_pct = None
+    covered = 0
+    valid = 0
     try:
-        tree = ET.parse(path)
+        for i, attrib in enumerate(_iter_attrs(path)):
+            pct = _rate_percent(attrib.get("line-rate"))
+            if i == 0:
+                root_pct = pct
+            if first_pct is None:
+                first_pct = pct
+
+            c = attrib.get("lines-covered") or attrib.get("covered")
+            v = (
+                attrib.get("lines-valid")
+                or attrib.get("valid")
+                or attrib.get("lines_total")
+                or attrib.get("lines-total")
+            )
+            if c is not None and v is not None:
+                try:
+                    covered += int(float(c))
+                    valid += int(float(v))
+                except Exception:
+                    pass
     except Exception:
         return None
-    root = tree.getroot()
 
     # 1) Common: root may have 'line-rate'
-    lr = root.attrib.get("line-rate")
-    if lr is not None:
-        try:
-            return float(lr) * 100.0
-        except Exception:
-            pass
+    if root_pct is not None:
+        return root_pct
 
     # 2) Sum up attributes like lines-covered / lines-valid across the document
-    covered = 0
-    valid = 0
-    for el in root.iter():
-        c = el.attrib.get("lines-covered") or el.attrib.get("covered")
-        v = (
-            el.attrib.get("lines-valid")
-            or el.attrib.get("valid")
-            or el.attrib.get("lines_total")
-            or el.attrib.get("lines-total")
-        )
-        if c is not None and v is not None:
-            try:
-                covered += int(float(c))
-                valid += int(float(v))
-            except Exception:
-                pass
     if valid > 0:
         return (covered / valid) * 100.0
 
-    # 3) Try any element with line-rate attribute
-    for el in root.iter():
-        lr = el.attrib.get("line-rate")
-        if lr is not None:
-            try:
-                return float(lr) * 100.0
-            except Exception:
-                pass
-
-    return None
+    # 3) Any element with a line-rate attribute, first in document order
+    return first_pct
 
 
 def find_low_coverage_filenames(path: str, threshold: float = 80.0) -> list[str]:
     """Return a list of filenames present in the coverage XML with line-rate < threshold."""
+    low: list[str] = []
     try:
-        tree = ET.parse(path)
+        for attrib in _iter_attrs(path):
+            fn = attrib.get("filename")
+            if not fn:
+                continue
+            pct = _rate_percent(attrib.get("line-rate"))
+            if pct is not None and pct < threshold:
+                low.append(fn)
     except Exception:
         return []
-    root = tree.getroot()
-
-    low: list[str] = []
-    for el in root.iter():
-        fn = el.attrib.get("filename")
-        if not fn:
-            continue
-        lr = el.attrib.get("line-rate")
-        if lr is None:
-            continue
-        try:
-            pct = float(lr) * 100.0
-        except Exception:
-            continue
-        if pct < threshold:
-            low.append(fn)
     return low
 
 
@@ -92,12 +110,12 @@ def main() -> int:
     script_dir = os.path.dirname(os.path.abspath(__file__))
     coverage_path = os.path.abspath(os.path.join(script_dir, '..', 'reports', 'coverage.xml'))
 
-    if not os.path.exists(coverage_path):
+    # one stat answers both "does it exist" and "is it empty"
+    try:
+        size = os.stat(coverage_path).st_size
+    except FileNotFoundError:
         print(f"FAIL: coverage.xml not found at {coverage_path}")
         return 1
-
-    try:
-        size = os.path.getsize(coverage_path)
     except Exception as e:
         print(f"FAIL: cannot stat coverage.xml: {e}")
         return 1
@@ -21,13 +21,13 @@ def _parse_porcelain_line(line: str) -> str:
     """
     # porcelain format: XY SP <path> [-> <path>]
     # untracked lines start with '?? '
-    if line.startswith("?? "):
+    if line[:3] == "?? ":
         return line[3:]
     # normal case: first 3 chars are status and a space
     tail = line[3:]
-    if " -> " in tail:
-        return tail.split(" -> ", 1)[1]
-    return tail
+    # single scan; keeps everything after the first separator as before
+    _, sep, new = tail.partition(" -> ")
+    return new if sep else tail
 
 
 def get_git_changes(repo_path: str) -> Dict[str, List[str]]:
@@ -262,8 +262,8 @@ def main(argv=None) -> int:
 	import json
 
 	try:
-		with open(rules_path, "r", encoding="utf-8") as f:
-			rules = json.load(f)
+		with open(rules_path, "rb") as f:
+			rules = json.loads(f.read())
 	except Exception as e:
 		print(f"Failed to load rules from {rules_path}: {e}", file=sys.stderr)
 		return 1
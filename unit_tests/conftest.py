@@ -0,0 +1,26 @@
+import importlib.util
+import pathlib
+
+import pytest
+
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+def _load_script(name):
+    spec = importlib.util.spec_from_file_location(name, str(ROOT / f"{name}.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+@pytest.fixture(scope="session")
+def gpt_validator_mod():
+    """gpt_validator.py loaded once per session; it keeps no module state."""
+    return _load_script("gpt_validator")
+
+
+@pytest.fixture(scope="session")
+def git_commands_mod():
+    """git_commands.py loaded once per session."""
+    return _load_script("git_commands")
@@ -1,25 +1,15 @@
-import importlib.util
 import pathlib
 import subprocess
 import sys
 import tempfile
 
 
-def _load_module(path_name: str):
-    root = pathlib.Path(__file__).resolve().parents[1]
-    mod_path = root / path_name
-    spec = importlib.util.spec_from_file_location(path_name.stem if isinstance(path_name, pathlib.Path) else "git_commands", str(mod_path))
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    return mod
-
-
 def _run(cmd, cwd):
     subprocess.run(cmd, cwd=cwd, check=True)
 
 
-def test_get_git_changes_untracked_and_staged():
-    git_commands = _load_module("git_commands.py")
+def test_get_git_changes_untracked_and_staged(git_commands_mod):
+    git_commands = git_commands_mod
     with tempfile.TemporaryDirectory() as td:
         # init repo
         _run(["git", "init"], cwd=td)
@@ -38,8 +28,8 @@ def test_get_git_changes_untracked_and_staged():
         assert "a.txt" in changes["created"]
 
 
-def test_get_git_changes_modified_after_commit():
-    git_commands = _load_module("git_commands.py")
+def test_get_git_changes_modified_after_commit(git_commands_mod):
+    git_commands = git_commands_mod
     with tempfile.TemporaryDirectory() as td:
         _run(["git", "init"], cwd=td)
         # configure user for commits
@@ -56,3 +46,10 @@ def test_get_git_changes_modified_after_commit():
 
         changes = git_commands.get_git_changes(td)
         assert "b.txt" in changes["modified"]
+
+
+def test_parse_porcelain_line_status_and_rename(git_commands_mod):
+    git_commands = git_commands_mod
+    assert git_commands._parse_porcelain_line("?? new.txt") == "new.txt"
+    assert git_commands._parse_porcelain_line(" M mod.txt") == "mod.txt"
+    assert git_commands._parse_porcelain_line("R  old.txt -> new.txt") == "new.txt"
@@ -1,19 +1,13 @@
 import json
-import pathlib
-import importlib.util
 import sys
 
 
-def _load_module():
-    root = pathlib.Path(__file__).resolve().parents[1]
-    mod_path = root / "gpt_validator.py"
-    spec = importlib.util.spec_from_file_location("gpt_validator", str(mod_path))
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    return mod
+_EMPTY_RULES_JSON = json.dumps({}).encode("utf-8")
+_JS_RULES_JSON = json.dumps({"language": "javascript", "test_path": "tests"}).encode("utf-8")
+_MISSING_TESTS_RULES_JSON = json.dumps({"language": "python", "test_path": "no_such_tests"}).encode("utf-8")
 
 
-def test_list_files_with_extension_basic(tmp_path):
+def test_list_files_with_extension_basic(tmp_path, gpt_validator_mod):
     repo = tmp_path / "repo"
     src = repo / "src"
     ignore = src / "ignore"
@@ -24,13 +18,13 @@ def test_list_files_with_extension_basic(tmp_path):
     (src / "b.py").write_text("# b")
     (ignore / "c.py").write_text("# c")
 
-    mod = _load_module()
+    mod = gpt_validator_mod
     files = mod.list_files_with_extension("py", exclude_paths=[str(ignore)], repo_root=str(src))
     # Should list only a.py and b.py (relative to repo_root which is src)
     assert sorted(files) == sorted(["a.py", "b.py"])
 
 
-def test_check_files_tested_detects_untested(tmp_path):
+def test_check_files_tested_detects_untested(tmp_path, gpt_validator_mod):
     repo = tmp_path / "repo2"
     repo.mkdir()
     tests = repo / "tests"
@@ -43,48 +37,48 @@ def test_check_files_tested_detects_untested(tmp_path):
     # create a test that mentions only alpha
     (tests / "test_alpha.py").write_text("def test_alpha():\n    assert 'alpha'\n")
 
-    mod = _load_module()
+    mod = gpt_validator_mod
     # files passed relative to repo_root
     missing = mod.check_files_tested(["alpha.py", "beta.py"], str(tests), repo_root=str(repo))
     assert missing == "beta.py"
 
 
-def test_main_with_bad_rules_json(tmp_path, capsys):
+def test_main_with_bad_rules_json(tmp_path, capsys, gpt_validator_mod):
     repo = tmp_path / "rrepo"
     repo.mkdir()
     bad = repo / "bad_rules.json"
     bad.write_text("{ this is not: json }")
-    mod = _load_module()
+    mod = gpt_validator_mod
     rc = mod.main(["--rules", str(bad)])
     assert rc == 1
 
 
-def test_main_with_rules_missing_keys(tmp_path):
+def test_main_with_rules_missing_keys(tmp_path, gpt_validator_mod):
     repo = tmp_path / "r2"
     repo.mkdir()
     rules = repo / "rules.json"
-    rules.write_text(json.dumps({}))
-    mod = _load_module()
+    rules.write_bytes(_EMPTY_RULES_JSON)
+    mod = gpt_validator_mod
     rc = mod.main(["--rules", str(rules)])
     assert rc == 1
 
 
-def test_main_run_tests_non_python_language(tmp_path):
+def test_main_run_tests_non_python_language(tmp_path, gpt_validator_mod):
     repo = tmp_path / "r3"
     repo.mkdir()
     rules = repo / "rules.json"
-    rules.write_text(json.dumps({"language": "javascript", "test_path": "tests"}))
-    mod = _load_module()
+    rules.write_bytes(_JS_RULES_JSON)
+    mod = gpt_validator_mod
     rc = mod.main(["--rules", str(rules), "--run-tests"])
     assert rc == 1
 
 
-def test_main_run_tests_missing_test_path(tmp_path):
+def test_main_run_tests_missing_test_path(tmp_path, gpt_validator_mod):
     repo = tmp_path / "r4"
     repo.mkdir()
     rules = repo / "rules.json"
-    rules.write_text(json.dumps({"language": "python", "test_path": "no_such_tests"}))
-    mod = _load_module()
+    rules.write_bytes(_MISSING_TESTS_RULES_JSON)
+    mod = gpt_validator_mod
     rc = mod.main(["--rules", str(rules), "--run-tests"])
     assert rc == 1
 